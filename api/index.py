@@ -1,10 +1,13 @@
 import json
 import re
+import sys
+import time
 from pathlib import Path
 
-from flask import Flask, jsonify, request
+from flask import Flask, g, jsonify, request
 import joblib
 import nltk
+import psycopg2
 from nltk.corpus import stopwords
 from nltk.stem import PorterStemmer, WordNetLemmatizer
 
@@ -12,26 +15,31 @@ from nltk.stem import PorterStemmer, WordNetLemmatizer
 app = Flask(__name__)
 
 ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT))
+
+import neardup  # noqa: E402
+import neon_db  # noqa: E402
+import oov_monitor  # noqa: E402
+from explain import Explainer  # noqa: E402
+import sessions  # noqa: E402
+import tracing  # noqa: E402
+import warmup  # noqa: E402
+from prefilter import Prefilter  # noqa: E402
+
 VECTORIZER_PATH = ROOT / "vectorizer.pkl"
 MODEL_PATH = ROOT / "model.pkl"
 METRICS_PATH = ROOT / "metrics.json"
+EXPLAIN_MAX_BATCH = 256
+EXPLAIN_MAX_TOP_K = 50
+OOV_MAX_TOP = 200
 
-
-def _ensure_nltk_data():
-    packages = ["punkt", "stopwords", "wordnet", "omw-1.4"]
-    for package in packages:
-        try:
-            if package == "punkt":
-                nltk.data.find("tokenizers/punkt")
-            else:
-                nltk.data.find(f"corpora/{package}")
-        except LookupError:
-            nltk.download(package, quiet=True)
-
-
-_ensure_nltk_data()
+warmup.ensure_nltk_data()
 VECTORIZER = joblib.load(VECTORIZER_PATH)
 MODEL = joblib.load(MODEL_PATH)
+PREFILTER = Prefilter()
+NEAR_DUPLICATES = neardup.from_env()
+EXPLAINER = Explainer(VECTORIZER, MODEL)
+OOV_MONITOR = oov_monitor.from_env(VECTORIZER.vocabulary_, tokenize=VECTORIZER.build_tokenizer())
 
 
 def transform_text(text: str):
@@ -61,11 +69,51 @@ def transform_text(text: str):
     }
 
 
+# corpora load lazily on first use; warm them before /api/ready reports ready
+WARMUP = warmup.Warmup(lambda: warmup.run(lambda text: transform_text(text)["transformed"], VECTORIZER, MODEL))
+WARMUP.start()
+
+
+@app.before_request
+def start_trace():
+    g.trace_span = tracing.begin(
+        f"{request.method} {request.path}",
+        traceparent=request.headers.get("traceparent"),
+        kind=tracing.KIND_SERVER,
+        attributes={"http.method": request.method, "http.route": request.path},
+    )
+
+
+@app.after_request
+def tag_trace(response):
+    span = g.get("trace_span")
+    if span is not None:
+        span.set_attribute("http.status_code", response.status_code)
+        if span.traceparent:
+            response.headers["traceparent"] = span.traceparent
+    return response
+
+
+@app.teardown_request
+def end_trace(error=None):
+    span = g.pop("trace_span", None)
+    if span is not None:
+        if error is not None:
+            span.record_error(error)
+        span.end()
+
+
 @app.get("/api/health")
 def health():
     return jsonify({"ok": True})
 
 
+@app.get("/api/ready")
+def ready():
+    snapshot = WARMUP.snapshot()
+    return jsonify(snapshot), 200 if snapshot["ready"] else 503
+
+
 @app.get("/api/models")
 def models():
     names = []
@@ -86,6 +134,33 @@ def metrics():
     return jsonify(data)
 
 
+@app.get("/api/prefilter")
+def prefilter_stats():
+    return jsonify(PREFILTER.snapshot())
+
+
+@app.get("/api/neardup")
+def neardup_stats():
+    if NEAR_DUPLICATES is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **NEAR_DUPLICATES.snapshot()})
+
+
+@app.get("/api/monitor/oov")
+def oov_stats():
+    if OOV_MONITOR is None:
+        return jsonify({"enabled": False})
+    try:
+        windows = [int(value) for value in request.args.getlist("window")] or None
+        top = min(max(int(request.args.get("top", 20)), 1), OOV_MAX_TOP)
+    except ValueError:
+        return jsonify({"error": "window and top must be integers"}), 400
+    if windows and min(windows) <= 0:
+        return jsonify({"error": "window must be positive"}), 400
+    tokens = request.args.getlist("token")
+    return jsonify({"enabled": True, **OOV_MONITOR.snapshot(windows=windows, top=top, tokens=tokens)})
+
+
 @app.post("/api/predict")
 def predict():
     body = request.get_json(silent=True) or {}
@@ -94,23 +169,153 @@ def predict():
     if not text:
         return jsonify({"error": "text is required"}), 400
 
-    steps = transform_text(text)
+    with tracing.span("prefilter"):
+        fast = PREFILTER.scan(text)
+    if fast["prediction"] is not None:
+        return jsonify(
+            {
+                "input": text,
+                "transformed": None,
+                "steps": None,
+                "prediction": fast["prediction"],
+                "probabilities": None,
+                "prefilter": fast,
+            }
+        )
+
+    signature = None
+    if NEAR_DUPLICATES is not None:
+        with tracing.span("neardup.lookup"):
+            signature = NEAR_DUPLICATES.signature(text)
+            hit = NEAR_DUPLICATES.lookup(text, signature=signature)
+        if hit is not None:
+            verdict, similarity = hit
+            return jsonify(
+                {
+                    "input": text,
+                    "transformed": None,
+                    "steps": None,
+                    "prediction": verdict["prediction"],
+                    "probabilities": verdict["probabilities"],
+                    "prefilter": fast,
+                    "near_duplicate": {"similarity": similarity},
+                }
+            )
+
+    start = time.perf_counter()
+    with tracing.span("transform_text"):
+        steps = transform_text(text)
     transformed = steps["transformed"]
-    vector = VECTORIZER.transform([transformed])
-    prediction = MODEL.predict(vector)[0]
+    with tracing.span("vectorize"):
+        vector = VECTORIZER.transform([transformed])
+    with tracing.span("model.predict"):
+        prediction = MODEL.predict(vector)[0]
 
-    probabilities = None
-    try:
-        probabilities = MODEL.predict_proba(vector).tolist()[0]
-    except Exception:
         probabilities = None
+        try:
+            probabilities = MODEL.predict_proba(vector).tolist()[0]
+        except Exception:
+            probabilities = None
+    PREFILTER.record_full_path(time.perf_counter() - start)
+
+    prediction = int(prediction) if hasattr(prediction, "__int__") else prediction
+    if OOV_MONITOR is not None:
+        OOV_MONITOR.observe(transformed, prediction, probabilities[-1] if probabilities else None)
+    if NEAR_DUPLICATES is not None:
+        NEAR_DUPLICATES.insert(
+            text, {"prediction": prediction, "probabilities": probabilities}, signature=signature
+        )
 
     return jsonify(
         {
             "input": text,
             "transformed": transformed,
             "steps": steps,
-            "prediction": int(prediction) if hasattr(prediction, "__int__") else prediction,
+            "prediction": prediction,
             "probabilities": probabilities,
+            "prefilter": fast,
+            "near_duplicate": None,
         }
     )
+
+
+@app.post("/api/explain")
+def explain():
+    body = request.get_json(silent=True) or {}
+    texts = body.get("texts")
+    if texts is None:
+        texts = [body.get("text")]
+    if not isinstance(texts, list):
+        return jsonify({"error": "texts must be a list"}), 400
+    texts = [(text or "").strip() if isinstance(text, str) else "" for text in texts]
+
+    if not texts or not all(texts):
+        return jsonify({"error": "text is required"}), 400
+    if len(texts) > EXPLAIN_MAX_BATCH:
+        return jsonify({"error": f"at most {EXPLAIN_MAX_BATCH} texts per request"}), 400
+    try:
+        top_k = min(max(int(body.get("top_k", 5)), 1), EXPLAIN_MAX_TOP_K)
+    except (TypeError, ValueError):
+        return jsonify({"error": "top_k must be an integer"}), 400
+
+    with tracing.span("transform_text", attributes={"batch.size": len(texts)}):
+        transformed = [transform_text(text)["transformed"] for text in texts]
+    with tracing.span("explain", attributes={"batch.size": len(texts)}):
+        explanations = EXPLAINER.explain(transformed, top_k=top_k)
+    for text, cleaned, explanation in zip(texts, transformed, explanations):
+        explanation["input"] = text
+        explanation["transformed"] = cleaned
+
+    return jsonify({"explanations": explanations})
+
+
+def _session_response(token):
+    expires_in = sessions.decode_token(token)["exp"] - int(time.time())
+    return jsonify({"token": token, "expires_in": expires_in})
+
+
+def _bearer_token():
+    header = request.headers.get("authorization", "")
+    if header.lower().startswith("bearer "):
+        return header[7:].strip()
+    return None
+
+
+@app.post("/api/login")
+def login():
+    if not neon_db.NEON_DB_URL:
+        return jsonify({"error": "accounts are not configured"}), 503
+
+    body = request.get_json(silent=True) or {}
+    email = (body.get("email") or "").strip().lower()
+    password = body.get("password") or ""
+    if not email or not password:
+        return jsonify({"error": "email and password are required"}), 400
+
+    try:
+        ok = neon_db.authenticate_user(email, password)
+    except sessions.AuthBusy:
+        return jsonify({"error": "too many logins in progress, retry shortly"}), 503, {"Retry-After": "1"}
+    except psycopg2.Error:
+        return jsonify({"error": "accounts database unavailable"}), 503, {"Retry-After": "5"}
+    if not ok:
+        return jsonify({"error": "invalid credentials"}), 401
+    return _session_response(sessions.issue_token(email))
+
+
+@app.post("/api/session/refresh")
+def session_refresh():
+    # renewal never re-checks the password, so it is capped at SESSION_MAX_AGE
+    # after the login that issued the original token
+    token = sessions.renew_token(_bearer_token())
+    if token is None:
+        return jsonify({"error": "invalid or expired session, log in again"}), 401
+    return _session_response(token)
+
+
+@app.get("/api/session")
+def session():
+    email = sessions.verify_token(_bearer_token())
+    if email is None:
+        return jsonify({"error": "invalid or expired session"}), 401
+    return jsonify({"email": email})
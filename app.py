@@ -4,12 +4,15 @@ import string
 from pathlib import Path
 
 import nltk
+import psycopg2
 import streamlit as st
 from nltk.corpus import stopwords
 from nltk.stem import WordNetLemmatizer
 from nltk.stem.porter import PorterStemmer
 
-from neon_db import authenticate_user, create_user, get_user_predictions, init_db, save_prediction
+from neon_db import authenticate_user, create_user, get_user_predictions, init_db, init_pool, save_prediction
+from sessions import AuthBusy, issue_token, verify_token
+from warmup import ensure_nltk_data, run as run_warmup
 
 
 st.set_page_config(page_title="SMS Spam Detection")
@@ -17,10 +20,7 @@ st.set_page_config(page_title="SMS Spam Detection")
 
 @st.cache_resource
 def setup_nltk():
-    nltk.download("punkt", quiet=True)
-    nltk.download("stopwords", quiet=True)
-    nltk.download("wordnet", quiet=True)
-    nltk.download("omw-1.4", quiet=True)
+    ensure_nltk_data()
 
 
 ps = PorterStemmer()
@@ -62,8 +62,15 @@ def load_artifacts():
         st.stop()
 
 
+@st.cache_resource(show_spinner="Warming up the model...")
+def warm_up(_model, _vectorizer):
+    """Load corpora and score a few messages once per server process."""
+    return run_warmup(transform_text, _vectorizer, _model)
+
+
 setup_nltk()
 model, vectorizer = load_artifacts()
+warm_up(model, vectorizer)
 
 
 def trigger_rerun() -> None:
@@ -74,13 +81,47 @@ def trigger_rerun() -> None:
     else:
         st.experimental_rerun()
 
+HISTORY_LIMIT = 200
+HISTORY_PAGE_SIZE = 20
+
+
+@st.cache_resource
+def setup_database():
+    """Create the connection pool and schema once per server process."""
+    init_pool()
+    init_db()
+    return True
+
+
+@st.cache_resource
+def history_versions():
+    """Per-user counter bumped on every save, shared by all sessions of this process."""
+    return {}
+
+
+@st.cache_data(show_spinner=False, max_entries=1000)
+def load_history(user_email: str, version: int):
+    """Recent predictions for a user; ``version`` changes when the user saves a new one."""
+    return [dict(item) for item in get_user_predictions(user_email, limit=HISTORY_LIMIT)]
+
+
+def predict_message(message: str):
+    """Score a message, reusing earlier results from this session."""
+    cache = st.session_state.setdefault("prediction_cache", {})
+    if message not in cache:
+        cleaned_message = transform_text(message)
+        transformed_input = vectorizer.transform([cleaned_message])
+        cache[message] = (cleaned_message, int(model.predict(transformed_input)[0]))
+    return cache[message]
+
+
 db_ready = True
 if not os.getenv("NEON_DB_URL"):
     db_ready = False
     st.warning("NEON_DB_URL is not set. Sign-in and history are disabled.")
 else:
     try:
-        init_db()
+        setup_database()
     except Exception as error:
         db_ready = False
         st.error(f"Database init failed: {error}")
@@ -89,6 +130,10 @@ if "logged_in" not in st.session_state:
     st.session_state["logged_in"] = False
 if "user_email" not in st.session_state:
     st.session_state["user_email"] = None
+if st.session_state["logged_in"] and verify_token(st.session_state.get("session_token")) is None:
+    st.session_state["logged_in"] = False
+    st.session_state["user_email"] = None
+    st.info("Your session expired. Please log in again.")
 
 with st.sidebar:
     st.markdown("## Account")
@@ -106,17 +151,27 @@ with st.sidebar:
                         st.success("Account created. Please log in.")
             else:
                 if st.button("Log in", key="login_btn"):
-                    if authenticate_user(email, password):
+                    try:
+                        authenticated = authenticate_user(email, password)
+                    except AuthBusy:
+                        authenticated = None
+                        st.warning("Too many logins in progress. Please try again.")
+                    except psycopg2.Error:
+                        authenticated = None
+                        st.error("The accounts database is unavailable. Please try again.")
+                    if authenticated:
                         st.session_state["logged_in"] = True
                         st.session_state["user_email"] = email.strip().lower()
+                        st.session_state["session_token"] = issue_token(st.session_state["user_email"])
                         trigger_rerun()
-                    else:
+                    elif authenticated is not None:
                         st.error("Invalid credentials")
         else:
             st.success(f"Signed in as: {st.session_state['user_email']}")
             if st.button("Log out", key="logout_btn"):
                 st.session_state["logged_in"] = False
                 st.session_state["user_email"] = None
+                st.session_state["session_token"] = None
                 trigger_rerun()
     else:
         st.info("Set NEON_DB_URL to enable accounts and history.")
@@ -130,9 +185,7 @@ if st.button("Predict"):
         st.warning("Please enter a message.")
     else:
         try:
-            cleaned_message = transform_text(message)
-            transformed_input = vectorizer.transform([cleaned_message])
-            prediction = model.predict(transformed_input)[0]
+            cleaned_message, prediction = predict_message(message)
 
             if int(prediction) == 1:
                 st.error("Spam")
@@ -150,19 +203,36 @@ if st.button("Predict"):
                     int(prediction),
                     label,
                 )
-                if not ok:
+                if ok:
+                    versions = history_versions()
+                    versions[st.session_state["user_email"]] = versions.get(st.session_state["user_email"], 0) + 1
+                else:
                     st.warning("Prediction was not saved to history.")
         except Exception as error:
             st.error(f"Prediction failed: {error}")
 
 if db_ready and st.session_state.get("logged_in"):
     st.subheader("Your History")
-    items = get_user_predictions(st.session_state["user_email"], limit=20)
-    if not items:
+    user_email = st.session_state["user_email"]
+    try:
+        items = load_history(user_email, history_versions().get(user_email, 0))
+    except Exception as error:
+        # errors are not cached, so the next rerun retries the query
+        items = None
+        st.error(f"Could not load history: {error}")
+    if items is not None and not items:
         st.info("No prediction history found.")
-    else:
-        for item in items:
-            label = str(item.get("label", "n/a")).upper()
-            text = item.get("text", "")
-            ts = item.get("timestamp", "")
-            st.write(f"**{label}** — {text} — {ts}")
+    elif items:
+        pages = (len(items) - 1) // HISTORY_PAGE_SIZE + 1
+        page = st.number_input("Page", min_value=1, max_value=pages, value=1, step=1, key="history_page")
+        start = (int(page) - 1) * HISTORY_PAGE_SIZE
+        rows = [
+            {
+                "label": str(item.get("label", "n/a")).upper(),
+                "text": item.get("text", ""),
+                "timestamp": item.get("timestamp", ""),
+            }
+            for item in items[start:start + HISTORY_PAGE_SIZE]
+        ]
+        st.dataframe(rows, use_container_width=True, hide_index=True)
+        st.caption(f"Page {int(page)} of {pages} — {len(items)} predictions")
@@ -10,15 +10,16 @@ sys.path.append(str(root))
 
 import joblib
 import nltk
+from explain import Explainer
+from prefilter import Prefilter
+import tracing
+import warmup
 from nltk.corpus import stopwords
 from nltk.stem import PorterStemmer, WordNetLemmatizer
 import re
 
 
 def transform_text(text):
-    nltk.download('punkt', quiet=True)
-    nltk.download('stopwords', quiet=True)
-    nltk.download('wordnet', quiet=True)
     # step 1: lowercase and tokenize
     raw = text
     lower = text.lower()
@@ -48,7 +49,7 @@ def transform_text(text):
     }
 
 
-def load_artifacts(model_name=None):
+def artifact_paths(model_name=None):
     # default names
     vector_path = root / 'vectorizer.pkl'
     model_path = root / 'model.pkl'
@@ -60,36 +61,179 @@ def load_artifacts(model_name=None):
             vector_path = cand1
         if cand2.exists():
             model_path = cand2
+    return vector_path, model_path
+
+
+def load_artifacts(model_name=None):
+    vector_path, model_path = artifact_paths(model_name)
     vec = joblib.load(vector_path)
     m = joblib.load(model_path)
     return vec, m
 
 
-def main():
-    parser = argparse.ArgumentParser()
-    parser.add_argument('--text', type=str, required=True)
-    parser.add_argument('--model', type=str, default='default')
-    args = parser.parse_args()
+def score(text, load, prefilter=None, explain=False, top_k=5, explainer=None):
+    """Prediction payload for one message.
 
-    vec, m = load_artifacts(args.model)
-    steps = transform_text(args.text)
+    ``load()`` returns ``(vectorizer, model)`` and must leave the NLTK data in place;
+    pass a prebuilt ``explainer`` for that pair to skip rebuilding it per call.
+    """
+    # fast path: decide from raw-text patterns before loading NLTK/sklearn state
+    fast = None
+    if prefilter is not None and not explain:
+        with tracing.span('prefilter'):
+            fast = prefilter.scan(text)
+        if fast['prediction'] is not None:
+            return {
+                'input': text,
+                'transformed': None,
+                'steps': None,
+                'prediction': fast['prediction'],
+                'probabilities': None,
+                'prefilter': fast
+            }
+
+    with tracing.span('load_artifacts'):
+        vec, m = load()
+    with tracing.span('transform_text'):
+        steps = transform_text(text)
     transformed = steps['transformed']
-    X = vec.transform([transformed])
-    pred = m.predict(X)[0]
-    probs = None
-    try:
-        probs = m.predict_proba(X).tolist()[0]
-    except Exception:
+    with tracing.span('vectorize'):
+        X = vec.transform([transformed])
+    with tracing.span('model.predict'):
+        pred = m.predict(X)[0]
         probs = None
+        try:
+            probs = m.predict_proba(X).tolist()[0]
+        except Exception:
+            probs = None
 
     out = {
-        'input': args.text,
+        'input': text,
         'transformed': transformed,
         'steps': steps,
         'prediction': int(pred) if hasattr(pred, '__int__') else pred,
-        'probabilities': probs
+        'probabilities': probs,
+        'prefilter': fast
     }
-    print(json.dumps(out))
+    if explain:
+        explainer = explainer or Explainer(vec, m)
+        out['explanation'] = explainer.explain([transformed], top_k=top_k)[0]['top']
+    return out
+
+
+def explain_texts(texts, vec, m, top_k=5, explainer=None):
+    transformed = [transform_text(t)['transformed'] for t in texts]
+    explanations = (explainer or Explainer(vec, m)).explain(transformed, top_k=top_k)
+    for text, cleaned, explanation in zip(texts, transformed, explanations):
+        explanation['input'] = text
+        explanation['transformed'] = cleaned
+    return {'explanations': explanations}
+
+
+def serve(model_name):
+    """Stay resident for the Express server: warm up once, then answer one JSON request per line.
+
+    Requests look like ``{"id", "text" | "texts", "model", "top_k", "explain", "traceparent"}``;
+    each reply is ``{"id", "result"}`` or ``{"id", "error"}`` on its own line.
+    """
+    # keyed by the files a name resolves to: unknown names share the default pair
+    cache = {}
+    explainers = {}
+
+    def load(name):
+        paths = artifact_paths(name)
+        if paths not in cache:
+            cache[paths] = tuple(joblib.load(path) for path in paths)
+        return cache[paths]
+
+    def explainer(name):
+        # building one walks the whole vocabulary, far slower than explaining a message
+        paths = artifact_paths(name)
+        if paths not in explainers:
+            explainers[paths] = Explainer(*load(name))
+        return explainers[paths]
+
+    vec, m = load(model_name)
+    timings = warmup.run(lambda t: transform_text(t)['transformed'], vec, m)
+    prefilter = Prefilter()
+    print(json.dumps({'ready': True, 'timings': timings}), flush=True)
+
+    for line in sys.stdin:
+        try:
+            request = json.loads(line)
+        except ValueError:
+            continue
+        name = request.get('model') or 'default'
+        span = tracing.begin('predict.py', traceparent=request.get('traceparent'))
+        try:
+            if request.get('texts') is not None:
+                result = explain_texts(request['texts'], *load(name), top_k=request.get('top_k', 5),
+                                       explainer=explainer(name))
+            else:
+                explain = bool(request.get('explain'))
+                result = score(request['text'], lambda: load(name), prefilter, explain=explain,
+                               top_k=request.get('top_k', 5), explainer=explainer(name) if explain else None)
+            reply = {'id': request.get('id'), 'result': result}
+        except Exception as e:
+            span.record_error(e)
+            reply = {'id': request.get('id'), 'error': f'{type(e).__name__}: {e}'}
+        finally:
+            span.end()
+        print(json.dumps(reply), flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--text', type=str, default=None)
+    parser.add_argument('--texts-json', type=str, default=None,
+                        help='JSON array of messages to explain in one batch')
+    parser.add_argument('--model', type=str, default='default')
+    parser.add_argument('--no-prefilter', action='store_true')
+    parser.add_argument('--explain', action='store_true',
+                        help='include the top contributing n-grams')
+    parser.add_argument('--top-k', type=int, default=5)
+    parser.add_argument('--warmup', action='store_true',
+                        help='fetch missing NLTK data, score sample messages and print timings')
+    parser.add_argument('--serve', action='store_true',
+                        help='warm up, then answer JSON requests on stdin, one per line')
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.model)
+        return
+    # continue the trace of the spawning Express request, if any
+    root_span = tracing.begin('predict.py', traceparent=os.getenv('TRACEPARENT'))
+    try:
+        run(parser, args)
+    except BaseException as e:
+        root_span.record_error(e)
+        raise
+    finally:
+        root_span.end()
+        tracing.flush()
+
+
+def run(parser, args):
+    if args.warmup:
+        vec, m = load_artifacts(args.model)
+        timings = warmup.run(lambda t: transform_text(t)['transformed'], vec, m)
+        print(json.dumps({'ready': True, 'timings': timings}))
+        return
+
+    def load():
+        warmup.ensure_nltk_data()
+        return load_artifacts(args.model)
+
+    if args.texts_json is not None:
+        vec, m = load()
+        print(json.dumps(explain_texts(json.loads(args.texts_json), vec, m, top_k=args.top_k)))
+        return
+    if args.text is None:
+        parser.error('--text or --texts-json is required')
+
+    prefilter = None if args.no_prefilter else Prefilter()
+    print(json.dumps(score(args.text, load, prefilter,
+                           explain=args.explain, top_k=args.top_k)))
 
 
 if __name__ == '__main__':
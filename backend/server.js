@@ -4,6 +4,7 @@ const bodyParser = require('body-parser');
 const { spawn } = require('child_process');
 const path = require('path');
 const http = require('http');
+const tracing = require('./tracing');
 
 const app = express();
 const server = http.createServer(app);
@@ -33,6 +34,138 @@ initMongo();
 app.use(cors());
 app.use(bodyParser.json());
 
+// Environment for predict.py, carrying the trace context of the spawning span
+function pythonEnv(span) {
+  return span.traceparent ? Object.assign({}, process.env, { TRACEPARENT: span.traceparent }) : process.env;
+}
+
+// One resident predict.py (--serve) loads the artifacts, warms NLTK and then
+// answers JSON requests line by line, so requests skip the Python cold start.
+// /ready stays 503 until it has warmed up; until then, and while it restarts,
+// requests fall back to spawning predict.py per call.
+const WORKER_TIMEOUT_MS = parseInt(process.env.PREDICT_WORKER_TIMEOUT_MS || '30000', 10);
+let readiness = { ready: false, state: 'starting', timings: null, error: null };
+const worker = { proc: null, pending: new Map(), nextId: 1, buffer: '' };
+
+function failPending(message) {
+  for (const { reject, timer } of worker.pending.values()) {
+    clearTimeout(timer);
+    reject(new Error(message));
+  }
+  worker.pending.clear();
+}
+
+function startWorker() {
+  const py = spawn('python3', [path.join(__dirname, 'predict.py'), '--serve']);
+  const started = Date.now();
+  let err = '';
+  worker.proc = py;
+  worker.buffer = '';
+  py.stdin.on('error', () => {});  // a dead worker is handled in 'close'
+  py.stderr.on('data', d => { err = (err + d.toString()).slice(-4000); });
+  py.stdout.on('data', d => {
+    worker.buffer += d.toString();
+    let newline;
+    while ((newline = worker.buffer.indexOf('\n')) >= 0) {
+      const line = worker.buffer.slice(0, newline);
+      worker.buffer = worker.buffer.slice(newline + 1);
+      let msg;
+      try { msg = JSON.parse(line); } catch (e) { continue; }
+      if (msg.ready) {
+        msg.timings.spawn_ms = Date.now() - started;
+        readiness = { ready: true, state: 'ready', timings: msg.timings, error: null };
+        continue;
+      }
+      const entry = worker.pending.get(msg.id);
+      if (!entry) continue;
+      worker.pending.delete(msg.id);
+      clearTimeout(entry.timer);
+      if (msg.error) entry.reject(new Error(msg.error));
+      else entry.resolve(msg.result);
+    }
+  });
+  py.on('error', e => { err = e.message; });
+  py.on('close', code => {
+    worker.proc = null;
+    readiness = { ready: false, state: 'restarting', timings: null, error: err || 'predict.py exited with ' + code };
+    failPending('predict worker exited');
+    setTimeout(startWorker, 1000).unref();
+  });
+}
+startWorker();
+
+function callWorker(request) {
+  return new Promise((resolve, reject) => {
+    const id = worker.nextId++;
+    const timer = setTimeout(() => {
+      worker.pending.delete(id);
+      reject(new Error('predict worker timed out'));
+    }, WORKER_TIMEOUT_MS);
+    worker.pending.set(id, { resolve, reject, timer });
+    worker.proc.stdin.write(JSON.stringify(Object.assign({ id }, request)) + '\n');
+  });
+}
+
+// Fallback: one predict.py process per call, as before the resident worker.
+function spawnPredict(args, span) {
+  return new Promise((resolve, reject) => {
+    const py = spawn('python3', [path.join(__dirname, 'predict.py')].concat(args), { env: pythonEnv(span) });
+    let out = '';
+    let err = '';
+    py.stdout.on('data', d => out += d.toString());
+    py.stderr.on('data', d => err += d.toString());
+    py.on('error', reject);
+    py.on('close', code => {
+      span.setAttribute('process.exit_code', code);
+      if (code !== 0) return reject(new Error(err || 'python exited with ' + code));
+      try { resolve(JSON.parse(out)); } catch (e) { reject(new Error('failed to parse python output')); }
+    });
+  });
+}
+
+function listModels() {
+  const fs = require('fs');
+  const root = path.resolve(__dirname, '..');
+  try {
+    const files = fs.readdirSync(root);
+    const models = files.filter(f => f.endsWith('.pkl') || f.endsWith('.joblib'))
+      .map(f => f.replace(/\.(pkl|joblib)$/, ''));
+    return models.length ? models : ['model'];
+  } catch (e) {
+    return ['model'];
+  }
+}
+
+// Only names from /models reach predict.py, so clients cannot make the resident worker load arbitrary names.
+function unknownModel(model) {
+  if (model === undefined || model === null || model === '' || model === 'default') return null;
+  if (typeof model === 'string' && listModels().includes(model)) return null;
+  return 'unknown model';
+}
+
+// Score ``{text}`` or explain ``{texts}`` through the resident worker when it is warm.
+function runPredict(request, span) {
+  const resident = readiness.ready && worker.proc !== null;
+  const pySpan = span.child('python predict.py', { model: request.model || 'default', resident }, tracing.KIND_CLIENT);
+  let pending;
+  if (resident) {
+    pending = callWorker(Object.assign({ traceparent: pySpan.traceparent }, request));
+  } else if (request.texts) {
+    pending = spawnPredict(['--texts-json', JSON.stringify(request.texts), '--model', request.model || 'default',
+      '--top-k', String(request.top_k || 5)], pySpan);
+  } else {
+    pending = spawnPredict(['--text', request.text, '--model', request.model || 'default'], pySpan);
+  }
+  return pending.then(
+    result => { pySpan.end(); return result; },
+    e => { pySpan.recordError(e); pySpan.end(); throw e; }
+  );
+}
+
+app.get('/ready', (req, res) => {
+  res.status(readiness.ready ? 200 : 503).json(readiness);
+});
+
 // Serve frontend static files
 app.use(express.static(path.join(__dirname, 'public')));
 
@@ -40,37 +173,64 @@ app.use(express.static(path.join(__dirname, 'public')));
 app.post('/predict', async (req, res) => {
   const { text, model } = req.body || {};
   if (!text) return res.status(400).json({ error: 'text is required' });
+  const modelError = unknownModel(model);
+  if (modelError) return res.status(400).json({ error: modelError });
+
+  const span = tracing.startSpan('POST /predict', req.headers.traceparent, { 'http.method': 'POST', 'http.route': '/predict' });
+  if (span.traceparent) res.set('traceparent', span.traceparent);
+  res.on('finish', () => { span.setAttribute('http.status_code', res.statusCode); span.end(); });
 
+  let parsed;
   try {
-    const py = spawn('python3', [path.join(__dirname, 'predict.py'), '--text', text, '--model', model || 'default']);
-    let out = '';
-    let err = '';
-    py.stdout.on('data', d => out += d.toString());
-    py.stderr.on('data', d => err += d.toString());
-    py.on('close', async code => {
-      if (code !== 0) return res.status(500).json({ error: err || 'python exited with ' + code });
-      try {
-        const parsed = JSON.parse(out);
-        // persist to MongoDB if available
-        if (predsCollection){
-          try{
-            const doc = {
-              text: parsed.input,
-              transformed: parsed.transformed,
-              steps: parsed.steps || null,
-              prediction: parsed.prediction,
-              probabilities: parsed.probabilities || null,
-              model: model || 'default',
-              ts: new Date()
-            };
-            await predsCollection.insertOne(doc);
-          }catch(e){ console.warn('insert failed', e.message); }
-        }
-        res.json(parsed);
-      } catch (e) {
-        res.status(500).json({ error: 'failed to parse python output', raw: out, err });
-      }
-    });
+    parsed = await runPredict({ text, model }, span);
+  } catch (e) {
+    return res.status(500).json({ error: e.message });
+  }
+  // persist to MongoDB if available
+  if (predsCollection){
+    const dbSpan = span.child('mongo insertOne', { 'db.system': 'mongodb', 'db.collection': 'predictions' }, tracing.KIND_CLIENT);
+    try{
+      const doc = {
+        text: parsed.input,
+        transformed: parsed.transformed,
+        steps: parsed.steps || null,
+        prediction: parsed.prediction,
+        probabilities: parsed.probabilities || null,
+        model: model || 'default',
+        ts: new Date()
+      };
+      await predsCollection.insertOne(doc);
+    }catch(e){ dbSpan.recordError(e); console.warn('insert failed', e.message); }
+    dbSpan.end();
+  }
+  res.json(parsed);
+});
+
+// Explain endpoint: top contributing n-grams for one or many messages
+// same limits as /api/explain in api/index.py
+const EXPLAIN_MAX_BATCH = 256;
+const EXPLAIN_MAX_TOP_K = 50;
+
+app.post('/explain', async (req, res) => {
+  const { text, texts, model } = req.body || {};
+  if (texts !== undefined && !Array.isArray(texts)) return res.status(400).json({ error: 'texts must be a list' });
+  const batch = (texts === undefined ? [text] : texts).map(t => (typeof t === 'string' ? t.trim() : ''));
+  if (!batch.length || batch.some(t => !t)) return res.status(400).json({ error: 'text is required' });
+  if (batch.length > EXPLAIN_MAX_BATCH) {
+    return res.status(400).json({ error: `at most ${EXPLAIN_MAX_BATCH} texts per request` });
+  }
+  const topK = Number((req.body || {}).top_k === undefined ? 5 : req.body.top_k);
+  if (!Number.isFinite(topK) || typeof req.body.top_k === 'boolean') {
+    return res.status(400).json({ error: 'top_k must be an integer' });
+  }
+  const top_k = Math.min(Math.max(Math.trunc(topK), 1), EXPLAIN_MAX_TOP_K);
+  const modelError = unknownModel(model);
+  if (modelError) return res.status(400).json({ error: modelError });
+
+  const span = tracing.startSpan('POST /explain', req.headers.traceparent, { 'http.method': 'POST', 'http.route': '/explain' });
+  res.on('finish', () => { span.setAttribute('http.status_code', res.statusCode); span.end(); });
+  try {
+    res.json(await runPredict({ texts: batch, model, top_k }, span));
   } catch (e) {
     res.status(500).json({ error: e.message });
   }
@@ -87,16 +247,7 @@ app.get('/history', async (req, res) => {
 
 // Simple endpoint to list available models (scans parent dir for model files)
 app.get('/models', (req, res) => {
-  const fs = require('fs');
-  const root = path.resolve(__dirname, '..');
-  try {
-    const files = fs.readdirSync(root);
-    const models = files.filter(f => f.endsWith('.pkl') || f.endsWith('.joblib'))
-      .map(f => f.replace(/\.(pkl|joblib)$/, ''));
-    res.json({ models: models.length ? models : ['model'] });
-  } catch (e) {
-    res.json({ models: ['model'] });
-  }
+  res.json({ models: listModels() });
 });
 
 // Metrics endpoint: serve metrics.json created by training script
@@ -119,20 +270,13 @@ io.on('connection', socket => {
   socket.on('sms', async payload => {
     const text = payload && payload.text;
     if (!text) return socket.emit('error', { message: 'text required' });
-    const py = spawn('python3', [path.join(__dirname, 'predict.py'), '--text', text, '--model', payload.model || 'default']);
-    let out = '';
-    let err = '';
-    py.stdout.on('data', d => out += d.toString());
-    py.stderr.on('data', d => err += d.toString());
-    py.on('close', code => {
-      if (code !== 0) return socket.emit('error', { message: err || 'python error' });
-      try {
-        const parsed = JSON.parse(out);
-        socket.emit('prediction', parsed);
-      } catch (e) {
-        socket.emit('error', { message: 'parse error', raw: out });
-      }
-    });
+    const modelError = unknownModel(payload.model);
+    if (modelError) return socket.emit('error', { message: modelError });
+    const span = tracing.startSpan('ws sms', payload.traceparent, { 'messaging.system': 'socket.io' });
+    runPredict({ text, model: payload.model }, span).then(
+      parsed => { span.end(); socket.emit('prediction', parsed); },
+      e => { span.end(); socket.emit('error', { message: e.message }); }
+    );
   });
 });
 
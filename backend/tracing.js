@@ -0,0 +1,160 @@
+// Minimal tracing for the Express server: W3C traceparent propagation and
+// OTLP/JSON export, mirroring tracing.py in the project root.
+//
+// TRACE_EXPORT_PATH  append one OTLP/JSON batch per line to this file
+// TRACE_EXPORT_URL   POST batches to an OTLP/HTTP endpoint (e.g. http://localhost:4318/v1/traces)
+// TRACE_SAMPLE_RATIO probability of keeping a new trace (default 0.01)
+const crypto = require('crypto');
+const fs = require('fs');
+const http = require('http');
+const https = require('https');
+
+const EXPORT_PATH = process.env.TRACE_EXPORT_PATH || '';
+const EXPORT_URL = process.env.TRACE_EXPORT_URL || '';
+const SAMPLE_RATIO = parseFloat(process.env.TRACE_SAMPLE_RATIO || '0.01');
+const SERVICE_NAME = process.env.TRACE_SERVICE_NAME || 'sms-spam-express';
+const FLUSH_INTERVAL_MS = parseFloat(process.env.TRACE_FLUSH_INTERVAL || '2') * 1000;
+const MAX_BATCH = 512;
+
+const KIND_INTERNAL = 1;
+const KIND_SERVER = 2;
+const KIND_CLIENT = 3;
+
+const enabled = Boolean(EXPORT_PATH || EXPORT_URL);
+let pending = [];
+let timer = null;
+
+// wall-clock epoch in ns, advanced with the monotonic clock for sub-ms precision
+const EPOCH_OFFSET_NS = BigInt(Date.now()) * 1000000n - process.hrtime.bigint();
+
+function nowNs() {
+  return (process.hrtime.bigint() + EPOCH_OFFSET_NS).toString();
+}
+
+function parseTraceparent(header) {
+  if (!header || typeof header !== 'string') return null;
+  const m = /^(?!ff)[0-9a-f]{2}-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})/.exec(header.trim());
+  if (!m || /^0+$/.test(m[1]) || /^0+$/.test(m[2])) return null;
+  return { traceId: m[1], spanId: m[2], sampled: (parseInt(m[3], 16) & 1) === 1 };
+}
+
+function attribute(key, value) {
+  if (typeof value === 'boolean') return { key, value: { boolValue: value } };
+  if (Number.isInteger(value)) return { key, value: { intValue: String(value) } };
+  if (typeof value === 'number') return { key, value: { doubleValue: value } };
+  return { key, value: { stringValue: String(value) } };
+}
+
+const NOOP = {
+  sampled: false,
+  traceparent: null,
+  child() { return NOOP; },
+  setAttribute() {},
+  recordError() {},
+  end() {}
+};
+
+class Span {
+  constructor(name, traceId, parentId, sampled, kind, attributes) {
+    this.name = name;
+    this.traceId = traceId;
+    this.spanId = crypto.randomBytes(8).toString('hex');
+    this.parentId = parentId;
+    this.sampled = sampled;
+    this.kind = kind;
+    this.attributes = Object.assign({}, attributes);
+    this.start = nowNs();
+    this.endTime = null;
+    this.error = null;
+  }
+
+  get traceparent() {
+    return `00-${this.traceId}-${this.spanId}-${this.sampled ? '01' : '00'}`;
+  }
+
+  child(name, attributes, kind) {
+    return new Span(name, this.traceId, this.spanId, this.sampled, kind || KIND_INTERNAL, attributes);
+  }
+
+  setAttribute(key, value) { this.attributes[key] = value; }
+
+  recordError(err) { this.error = (err && err.message) || String(err); }
+
+  end() {
+    if (this.endTime) return;
+    this.endTime = nowNs();
+    if (this.sampled) add(this);
+  }
+
+  toOtlp() {
+    const span = {
+      traceId: this.traceId,
+      spanId: this.spanId,
+      name: this.name,
+      kind: this.kind,
+      startTimeUnixNano: this.start,
+      endTimeUnixNano: this.endTime,
+      attributes: Object.entries(this.attributes).map(([k, v]) => attribute(k, v))
+    };
+    if (this.parentId) span.parentSpanId = this.parentId;
+    if (this.error) span.status = { code: 2, message: this.error };
+    return span;
+  }
+}
+
+// Start a root span for an incoming request, continuing the caller's trace if
+// a valid traceparent was sent.
+function startSpan(name, traceparent, attributes, kind) {
+  if (!enabled) return NOOP;
+  const parent = parseTraceparent(traceparent);
+  if (parent) return new Span(name, parent.traceId, parent.spanId, parent.sampled, kind || KIND_SERVER, attributes);
+  const sampled = Math.random() < SAMPLE_RATIO;
+  return new Span(name, crypto.randomBytes(16).toString('hex'), null, sampled, kind || KIND_SERVER, attributes);
+}
+
+function add(span) {
+  pending.push(span);
+  if (pending.length >= MAX_BATCH) return flush();
+  if (!timer) {
+    timer = setTimeout(() => { timer = null; flush(); }, FLUSH_INTERVAL_MS);
+    timer.unref();
+  }
+}
+
+function payload(batch) {
+  return JSON.stringify({
+    resourceSpans: [{
+      resource: { attributes: [attribute('service.name', SERVICE_NAME), attribute('process.pid', process.pid)] },
+      scopeSpans: [{ scope: { name: 'tracing.js' }, spans: batch.map(s => s.toOtlp()) }]
+    }]
+  });
+}
+
+function flush() {
+  if (!pending.length) return;
+  const body = payload(pending);
+  pending = [];
+  if (EXPORT_PATH) {
+    fs.appendFile(EXPORT_PATH, body + '\n', () => {});
+  }
+  if (EXPORT_URL) {
+    try {
+      const url = new URL(EXPORT_URL);
+      const client = url.protocol === 'https:' ? https : http;
+      const req = client.request(url, { method: 'POST', headers: { 'content-type': 'application/json' }, timeout: 2000 });
+      req.on('error', () => {});
+      req.on('timeout', () => req.destroy());
+      req.end(body);
+    } catch (e) { /* exporting must never break serving */ }
+  }
+}
+
+process.on('exit', () => {
+  if (!pending.length || !EXPORT_PATH) return;
+  try {
+    fs.appendFileSync(EXPORT_PATH, payload(pending) + '\n');
+  } catch (e) { /* ignore */ }
+  pending = [];
+});
+
+module.exports = { startSpan, parseTraceparent, flush, enabled, KIND_INTERNAL, KIND_SERVER, KIND_CLIENT };
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""Mixed login/predict load, before and after session tokens + the bcrypt pool.
+
+Simulated request threads pick a login with probability ``--login-ratio`` and
+a prediction otherwise. ``--returning-ratio`` of logins come from users who
+already hold a session.
+
+- ``before``: every login runs ``bcrypt.checkpw`` on the request thread.
+- ``after``:  returning users verify their signed token; fresh logins go
+  through the bounded bcrypt pool in ``sessions`` and are shed when it is full.
+
+No database is needed: one stored hash at ``BCRYPT_ROUNDS`` stands in for the
+users table. Reports prediction throughput/latency and login outcomes.
+
+  python bench/auth_bench.py --threads 8 --duration 20 --login-ratio 0.2
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from loadtest import RESULTS_DIR, ROOT, git_commit, percentile  # noqa: E402
+
+sys.path.append(str(ROOT))
+
+import bcrypt  # noqa: E402
+
+import sessions  # noqa: E402
+from microbench import load_inputs  # noqa: E402
+
+PASSWORD = b"correct horse battery staple"
+
+
+def run_mode(mode, predict_one, stored_hash, token, args):
+    stop_at = time.perf_counter() + args.duration
+    lock = threading.Lock()
+    predict_latencies, login_latencies = [], []
+    counts = {"login_ok": 0, "login_shed": 0, "predict": 0}
+
+    def login(rng):
+        if mode == "before":
+            return bcrypt.checkpw(PASSWORD, stored_hash)
+        if rng.random() < args.returning_ratio:
+            return sessions.verify_token(token) is not None
+        ok, _ = sessions.check_password(PASSWORD, stored_hash)
+        return ok
+
+    def worker(seed):
+        rng = random.Random(seed)
+        i = seed
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            if rng.random() < args.login_ratio:
+                try:
+                    login(rng)
+                    key = "login_ok"
+                except sessions.AuthBusy:
+                    key = "login_shed"
+                elapsed = time.perf_counter() - start
+                with lock:
+                    counts[key] += 1
+                    login_latencies.append(elapsed)
+            else:
+                predict_one(i)
+                i += args.threads
+                elapsed = time.perf_counter() - start
+                with lock:
+                    counts["predict"] += 1
+                    predict_latencies.append(elapsed)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(args.threads)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    predict_latencies.sort()
+    login_latencies.sort()
+    ms = lambda value: round(value * 1e3, 3) if value is not None else None  # noqa: E731
+    return {
+        **counts,
+        "predict_rps": round(counts["predict"] / elapsed, 2),
+        "predict_latency_ms": {q: ms(percentile(predict_latencies, int(q[1:]))) for q in ("p50", "p95", "p99")},
+        "login_rps": round(counts["login_ok"] / elapsed, 2),
+        "login_latency_ms": {q: ms(percentile(login_latencies, int(q[1:]))) for q in ("p50", "p95", "p99")},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--login-ratio", type=float, default=0.2)
+    parser.add_argument("--returning-ratio", type=float, default=0.9)
+    parser.add_argument("--messages", type=int, default=512)
+    parser.add_argument("--out", type=str, default=str(RESULTS_DIR))
+    args = parser.parse_args()
+
+    vectorizer, model, transformed = load_inputs(args.messages)
+
+    def predict_one(i):
+        model.predict(vectorizer.transform([transformed[i % len(transformed)]]))
+
+    stored_hash = bcrypt.hashpw(PASSWORD, bcrypt.gensalt(rounds=sessions.BCRYPT_ROUNDS))
+    token = sessions.issue_token("bench@example.com")
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "threads": args.threads,
+            "duration_s": args.duration,
+            "login_ratio": args.login_ratio,
+            "returning_ratio": args.returning_ratio,
+            "bcrypt_rounds": sessions.BCRYPT_ROUNDS,
+            "bcrypt_workers": sessions.BCRYPT_WORKERS,
+            "bcrypt_max_pending": sessions.BCRYPT_MAX_PENDING,
+        },
+        "results": {},
+    }
+    for mode in ("before", "after"):
+        result = run_mode(mode, predict_one, stored_hash, token, args)
+        report["results"][mode] = result
+        print(f"{mode:<7} predict {result['predict_rps']:>9} rps  p95 {result['predict_latency_ms']['p95']} ms  "
+              f"logins {result['login_rps']} rps  shed {result['login_shed']}")
+
+    out_dir = Path(args.out)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    out_path = out_dir / f"auth-{(report['meta']['commit'] or 'nocommit')[:8]}-{stamp}.json"
+    out_path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"saved {out_path}")
+
+
+if __name__ == "__main__":
+    main()
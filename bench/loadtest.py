@@ -0,0 +1,599 @@
+#!/usr/bin/env python3
+"""Load generator for the HTTP and WebSocket serving paths.
+
+Replays ``sms-spam.csv`` against one of:
+
+- ``flask``    -- ``POST /api/predict`` on ``api/index.py``
+- ``express``  -- ``POST /predict`` on ``backend/server.js``
+- ``socketio`` -- the ``sms`` event on the ``backend/server.js`` socket.io server
+
+in open-loop mode (fixed arrival rate; latency measured from the intended send
+time, requests beyond ``--max-inflight`` are shed client-side) or closed-loop
+mode (fixed number of concurrent clients). Unless ``--url`` is given the server
+is started locally, with throwaway Postgres/Mongo instances as stand-ins when
+``initdb``/``mongod`` are installed. Server RSS (including child processes) is
+sampled over the run.
+
+Results are written as JSON under ``bench/results/`` tagged with the git commit
+so runs can be compared:
+
+  python bench/loadtest.py run --target flask --mode closed --concurrency 8 --duration 30
+  python bench/loadtest.py run --target express --mode open --rate 20 --duration 60
+  python bench/loadtest.py compare bench/results/a.json bench/results/b.json
+"""
+import argparse
+import base64
+import csv
+import http.client
+import json
+import os
+import shutil
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import urlparse
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+PATHS = {"flask": "/api/predict", "express": "/predict"}
+READY_PATHS = {"flask": "/api/ready", "express": "/ready", "socketio": "/ready"}
+
+
+def load_messages(path=ROOT / "sms-spam.csv"):
+    with open(path, "r", encoding="latin-1", newline="") as file:
+        rows = csv.reader(file)
+        next(rows, None)
+        return [row[1] for row in rows if len(row) > 1 and row[1].strip()]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, timeout=120.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def wait_for_ready(port, path, timeout=120.0):
+    """Poll a readiness endpoint until it answers 200, so runs never measure warmup."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", path)
+            status = conn.getresponse().status
+            conn.close()
+            if status == 200:
+                return True
+        except OSError:
+            pass
+        time.sleep(0.2)
+    return False
+
+
+# --- clients -----------------------------------------------------------------
+
+class HttpClient:
+    """Keep-alive JSON client for one thread."""
+
+    def __init__(self, host, port, path, timeout):
+        self.host, self.port, self.path, self.timeout = host, port, path, timeout
+        self.conn = None
+
+    def send(self, text):
+        body = json.dumps({"text": text})
+        for attempt in range(2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self.conn.request("POST", self.path, body=body, headers={"content-type": "application/json"})
+                response = self.conn.getresponse()
+                response.read()
+                if response.status in (429, 503):
+                    return "shed"
+                return "ok" if response.status < 400 else "error"
+            except (OSError, http.client.HTTPException):
+                self.conn.close()
+                self.conn = None
+                if attempt:
+                    return "error"
+        return "error"
+
+
+class SocketIOClient:
+    """Minimal socket.io (Engine.IO v4) client over a raw RFC 6455 WebSocket."""
+
+    def __init__(self, host, port, timeout):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        key = base64.b64encode(os.urandom(16)).decode()
+        self.sock.sendall(
+            (
+                "GET /socket.io/?EIO=4&transport=websocket HTTP/1.1\r\n"
+                f"Host: {host}:{port}\r\n"
+                "Upgrade: websocket\r\nConnection: Upgrade\r\n"
+                f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n"
+            ).encode()
+        )
+        buf = b""
+        while b"\r\n\r\n" not in buf:
+            chunk = self.sock.recv(4096)
+            if not chunk:
+                raise ConnectionError("websocket handshake closed")
+            buf += chunk
+        head, self._buf = buf.split(b"\r\n\r\n", 1)
+        if b" 101 " not in head.split(b"\r\n", 1)[0]:
+            raise ConnectionError(head.split(b"\r\n", 1)[0].decode(errors="replace"))
+        self._recv_packet()  # Engine.IO open packet: 0{"sid": ...}
+        self._send_text("40")
+        while not self._recv_packet().startswith("40"):
+            pass
+
+    def _recv_exact(self, n):
+        while len(self._buf) < n:
+            chunk = self.sock.recv(65536)
+            if not chunk:
+                raise ConnectionError("websocket closed")
+            self._buf += chunk
+        data, self._buf = self._buf[:n], self._buf[n:]
+        return data
+
+    def _send_frame(self, opcode, payload):
+        header = bytearray([0x80 | opcode])
+        length = len(payload)
+        if length < 126:
+            header.append(0x80 | length)
+        elif length < 65536:
+            header.append(0x80 | 126)
+            header += struct.pack("!H", length)
+        else:
+            header.append(0x80 | 127)
+            header += struct.pack("!Q", length)
+        mask = os.urandom(4)
+        repeated = (mask * (length // 4 + 1))[:length]
+        masked = (int.from_bytes(payload, "big") ^ int.from_bytes(repeated, "big")).to_bytes(length, "big")
+        self.sock.sendall(bytes(header) + mask + masked)
+
+    def _send_text(self, text):
+        self._send_frame(0x1, text.encode("utf-8"))
+
+    def _recv_packet(self):
+        message = b""
+        while True:
+            first, second = self._recv_exact(2)
+            opcode, length = first & 0x0F, second & 0x7F
+            if length == 126:
+                length = struct.unpack("!H", self._recv_exact(2))[0]
+            elif length == 127:
+                length = struct.unpack("!Q", self._recv_exact(8))[0]
+            payload = self._recv_exact(length)
+            if opcode == 0x8:
+                raise ConnectionError("websocket closed by server")
+            if opcode == 0x9:
+                self._send_frame(0xA, payload)
+                continue
+            message += payload
+            if not first & 0x80:
+                continue
+            text = message.decode("utf-8")
+            message = b""
+            if text == "2":  # Engine.IO ping
+                self._send_text("3")
+                continue
+            return text
+
+    def send(self, text):
+        try:
+            self._send_text("42" + json.dumps(["sms", {"text": text}]))
+            while True:
+                packet = self._recv_packet()
+                if packet.startswith("42"):
+                    event = json.loads(packet[2:])[0]
+                    return "ok" if event == "prediction" else "error"
+        except (OSError, ValueError):
+            return "error"
+
+    def close(self):
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+def client_factory(target, host, port, timeout):
+    if target == "socketio":
+        return lambda: SocketIOClient(host, port, timeout)
+    return lambda: HttpClient(host, port, PATHS[target], timeout)
+
+
+# --- load shapes -------------------------------------------------------------
+
+def _discard(client):
+    close = getattr(client, "close", None)
+    if close is not None:
+        try:
+            close()
+        except Exception:
+            pass
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = []  # (finished_at, latency_seconds, status)
+
+    def add(self, latency, status):
+        self.samples.append((time.perf_counter(), latency, status))
+
+
+def run_closed_loop(make_client, messages, recorder, concurrency, duration):
+    stop_at = time.perf_counter() + duration
+
+    def worker(offset):
+        client = None
+        i = offset
+        while time.perf_counter() < stop_at:
+            text = messages[i % len(messages)]
+            i += concurrency
+            start = time.perf_counter()
+            status = "error"
+            try:
+                if client is None:
+                    client = make_client()
+                status = client.send(text)
+            except Exception:
+                _discard(client)
+                client = None
+                # don't spin on a server that refuses connections
+                time.sleep(0.05)
+            recorder.add(time.perf_counter() - start, status)
+
+    threads = [threading.Thread(target=worker, args=(n,), daemon=True) for n in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def run_open_loop(make_client, messages, recorder, rate, duration, max_inflight):
+    local = threading.local()
+    slots = threading.BoundedSemaphore(max_inflight)
+
+    def task(text, intended):
+        status = "error"
+        try:
+            if getattr(local, "client", None) is None:
+                local.client = make_client()
+            status = local.client.send(text)
+        except Exception:
+            # any client failure (protocol, framing, socket) is an error, and
+            # the connection is not reused
+            _discard(getattr(local, "client", None))
+            local.client = None
+        finally:
+            # measured from the scheduled send time to avoid coordinated omission
+            recorder.add(time.perf_counter() - intended, status)
+            slots.release()
+
+    total = int(rate * duration)
+    with ThreadPoolExecutor(max_workers=max_inflight) as executor:
+        start = time.perf_counter()
+        for i in range(total):
+            intended = start + i / rate
+            delay = intended - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            if not slots.acquire(blocking=False):
+                recorder.add(0.0, "shed")
+                continue
+            executor.submit(task, messages[i % len(messages)], intended)
+
+
+# --- server processes --------------------------------------------------------
+
+def process_tree(pid):
+    """``pid`` plus all of its descendants."""
+    children = {}
+    for entry in Path("/proc").iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            stat = (entry / "stat").read_text()
+        except OSError:
+            continue
+        ppid = int(stat.rsplit(")", 1)[1].split()[1])
+        children.setdefault(ppid, []).append(int(entry.name))
+    tree, stack = [], [pid]
+    while stack:
+        current = stack.pop()
+        tree.append(current)
+        stack.extend(children.get(current, []))
+    return tree
+
+
+def rss_kb(pid):
+    total = 0
+    for member in process_tree(pid):
+        try:
+            for line in Path(f"/proc/{member}/status").read_text().splitlines():
+                if line.startswith("VmRSS:"):
+                    total += int(line.split()[1])
+        except OSError:
+            continue
+    return total
+
+
+class RssSampler(threading.Thread):
+    def __init__(self, pid, interval):
+        super().__init__(daemon=True)
+        self.pid, self.interval = pid, interval
+        self.samples = []
+        self._stop_event = threading.Event()
+        self._start = time.perf_counter()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.samples.append((round(time.perf_counter() - self._start, 3), rss_kb(self.pid)))
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def _find_binary(name):
+    found = shutil.which(name)
+    if found:
+        return found
+    for candidate in sorted(Path("/usr/lib/postgresql").glob(f"*/bin/{name}"), reverse=True):
+        return str(candidate)
+    return None
+
+
+class StandIns:
+    """Throwaway local Postgres and Mongo instances for the server under test."""
+
+    def __init__(self, workdir):
+        self.workdir = Path(workdir)
+        self.env = {}
+        self.status = {}
+        self._stoppers = []
+
+    def start_postgres(self):
+        initdb, pg_ctl = _find_binary("initdb"), _find_binary("pg_ctl")
+        if not initdb or not pg_ctl:
+            self.status["postgres"] = "unavailable (initdb/pg_ctl not found)"
+            return
+        data = self.workdir / "pg"
+        port = free_port()
+        subprocess.run([initdb, "-D", str(data), "-A", "trust", "-U", "postgres"],
+                       check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        subprocess.run([pg_ctl, "-D", str(data), "-w", "-l", str(self.workdir / "pg.log"), "-o",
+                        f"-p {port} -k {data} -c listen_addresses=127.0.0.1", "start"],
+                       check=True, stdout=subprocess.DEVNULL)
+        self._stoppers.append(lambda: subprocess.run([pg_ctl, "-D", str(data), "-m", "fast", "stop"],
+                                                     stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+        self.env["NEON_DB_URL"] = f"postgresql://postgres@127.0.0.1:{port}/postgres"
+        self.status["postgres"] = self.env["NEON_DB_URL"]
+
+    def start_mongo(self):
+        mongod = shutil.which("mongod")
+        if not mongod:
+            # point at a closed port so the server runs with persistence disabled
+            self.env["MONGO_URI"] = f"mongodb://127.0.0.1:{free_port()}/?serverSelectionTimeoutMS=500"
+            self.status["mongo"] = "unavailable (mongod not found; persistence disabled)"
+            return
+        data = self.workdir / "mongo"
+        data.mkdir()
+        port = free_port()
+        proc = subprocess.Popen([mongod, "--dbpath", str(data), "--port", str(port), "--bind_ip", "127.0.0.1"],
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        self._stoppers.append(lambda: (proc.terminate(), proc.wait(10)))
+        wait_for_port(port, timeout=30)
+        self.env["MONGO_URI"] = f"mongodb://127.0.0.1:{port}"
+        self.env["MONGO_DB"] = "loadtest"
+        self.status["mongo"] = self.env["MONGO_URI"]
+
+    def stop(self):
+        for stop in reversed(self._stoppers):
+            try:
+                stop()
+            except Exception:
+                pass
+
+
+def start_server(target, port, env, log_path):
+    if target == "flask":
+        cmd = [sys.executable, "-m", "flask", "--app", str(ROOT / "api" / "index.py"), "run",
+               "--host", "127.0.0.1", "--port", str(port), "--with-threads"]
+    else:
+        cmd = ["node", str(ROOT / "backend" / "server.js")]
+    log = open(log_path, "wb")
+    return subprocess.Popen(cmd, cwd=ROOT, env={**os.environ, **env, "PORT": str(port)},
+                            stdout=log, stderr=subprocess.STDOUT)
+
+
+# --- reporting ---------------------------------------------------------------
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(q / 100.0 * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+def summarize(samples, elapsed):
+    total = len(samples)
+    ok = [latency for _, latency, status in samples if status == "ok"]
+    errors = sum(1 for _, _, status in samples if status == "error")
+    shed = sum(1 for _, _, status in samples if status == "shed")
+    ok.sort()
+    to_ms = lambda value: round(value * 1e3, 3) if value is not None else None  # noqa: E731
+    return {
+        "requests": total,
+        "ok": len(ok),
+        "errors": errors,
+        "shed": shed,
+        "error_rate": errors / total if total else 0.0,
+        "shed_rate": shed / total if total else 0.0,
+        "throughput_rps": round(len(ok) / elapsed, 3) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": to_ms(percentile(ok, 50)),
+            "p95": to_ms(percentile(ok, 95)),
+            "p99": to_ms(percentile(ok, 99)),
+            "max": to_ms(ok[-1] if ok else None),
+            "mean": to_ms(sum(ok) / len(ok) if ok else None),
+        },
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    messages = load_messages()
+    workdir = Path(tempfile.mkdtemp(prefix="loadtest-"))
+    stand_ins = StandIns(workdir)
+    server = None
+    try:
+        if args.url:
+            parsed = urlparse(args.url)
+            host, port = parsed.hostname, parsed.port or 80
+            server_pid = args.pid
+        else:
+            if args.stand_ins:
+                stand_ins.start_postgres()
+                stand_ins.start_mongo()
+            host, port = "127.0.0.1", free_port()
+            server = start_server(args.target, port, stand_ins.env, workdir / "server.log")
+            server_pid = server.pid
+            if not (wait_for_port(port, timeout=args.startup_timeout)
+                    and wait_for_ready(port, READY_PATHS[args.target], timeout=args.startup_timeout)):
+                raise RuntimeError(f"server did not start; see {workdir / 'server.log'}")
+
+        make_client = client_factory(args.target, host, port, args.timeout)
+        sampler = RssSampler(server_pid, args.rss_interval) if server_pid else None
+        if sampler:
+            sampler.start()
+
+        recorder = Recorder()
+        started = time.perf_counter()
+        if args.mode == "open":
+            run_open_loop(make_client, messages, recorder, args.rate, args.duration, args.max_inflight)
+        else:
+            run_closed_loop(make_client, messages, recorder, args.concurrency, args.duration)
+        elapsed = time.perf_counter() - started
+        if sampler:
+            sampler.stop()
+
+        rss = sampler.samples if sampler else []
+        report = {
+            "meta": {
+                "commit": git_commit(),
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "target": args.target,
+                "mode": args.mode,
+                "rate": args.rate if args.mode == "open" else None,
+                "concurrency": args.concurrency if args.mode == "closed" else None,
+                "max_inflight": args.max_inflight if args.mode == "open" else None,
+                "duration_s": args.duration,
+                "elapsed_s": round(elapsed, 3),
+                "url": args.url or f"http://{host}:{port}",
+                "messages": len(messages),
+            },
+            "stand_ins": stand_ins.status,
+            "results": summarize(recorder.samples, elapsed),
+            "rss_kb": {
+                "peak": max((value for _, value in rss), default=None),
+                "samples": rss,
+            },
+        }
+    finally:
+        if server is not None:
+            server.terminate()
+            try:
+                server.wait(10)
+            except subprocess.TimeoutExpired:
+                server.kill()
+        stand_ins.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    out_dir = Path(args.out)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    commit = (report["meta"]["commit"] or "nocommit")[:8]
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    out_path = out_dir / f"{args.target}-{args.mode}-{commit}-{stamp}.json"
+    out_path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(json.dumps(report["results"], indent=2))
+    print(f"saved {out_path}")
+    return report
+
+
+def compare(args):
+    old = json.loads(Path(args.old).read_text(encoding="utf-8"))
+    new = json.loads(Path(args.new).read_text(encoding="utf-8"))
+    rows = [
+        ("throughput_rps", old["results"]["throughput_rps"], new["results"]["throughput_rps"]),
+        ("error_rate", old["results"]["error_rate"], new["results"]["error_rate"]),
+        ("shed_rate", old["results"]["shed_rate"], new["results"]["shed_rate"]),
+        ("rss_peak_kb", old["rss_kb"]["peak"], new["rss_kb"]["peak"]),
+    ]
+    for key in ("p50", "p95", "p99"):
+        rows.append((f"latency_{key}_ms", old["results"]["latency_ms"][key], new["results"]["latency_ms"][key]))
+    print(f"{'metric':<20}{(old['meta']['commit'] or '')[:8]:>14}{(new['meta']['commit'] or '')[:8]:>14}{'change':>10}")
+    for name, before, after in rows:
+        change = f"{(after - before) / before * 100:+.1f}%" if before and after is not None else "n/a"
+        print(f"{name:<20}{str(before):>14}{str(after):>14}{change:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = sub.add_parser("run", help="generate load against one endpoint")
+    run_parser.add_argument("--target", choices=["flask", "express", "socketio"], required=True)
+    run_parser.add_argument("--mode", choices=["open", "closed"], default="closed")
+    run_parser.add_argument("--rate", type=float, default=10.0, help="open loop: requests per second")
+    run_parser.add_argument("--max-inflight", type=int, default=64, help="open loop: shed beyond this")
+    run_parser.add_argument("--concurrency", type=int, default=4, help="closed loop: concurrent clients")
+    run_parser.add_argument("--duration", type=float, default=30.0)
+    run_parser.add_argument("--timeout", type=float, default=30.0)
+    run_parser.add_argument("--url", type=str, default=None, help="use an already running server")
+    run_parser.add_argument("--pid", type=int, default=None, help="server pid for RSS sampling with --url")
+    run_parser.add_argument("--no-stand-ins", dest="stand_ins", action="store_false")
+    run_parser.add_argument("--startup-timeout", type=float, default=120.0)
+    run_parser.add_argument("--rss-interval", type=float, default=0.5)
+    run_parser.add_argument("--out", type=str, default=str(RESULTS_DIR))
+    run_parser.set_defaults(func=run)
+
+    compare_parser = sub.add_parser("compare", help="compare two saved runs")
+    compare_parser.add_argument("old")
+    compare_parser.add_argument("new")
+    compare_parser.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""In-process microbenchmarks for the scoring path, with latency budgets.
+
+Messages from ``sms-spam.csv`` are preprocessed once with the training
+``transform_text``; each case then times only the step it is named after.
+A case fails when its p95 per-message latency exceeds its budget and the
+script exits non-zero, so it can gate changes in CI.
+
+  python bench/microbench.py
+  python bench/microbench.py --case explain --budget explain_batch=150
+  python bench/microbench.py --case oov_monitor
+"""
+import argparse
+import json
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from loadtest import RESULTS_DIR, ROOT, git_commit, load_messages  # noqa: E402
+
+sys.path.append(str(ROOT))
+
+# p95 microseconds per message
+BUDGETS_US = {
+    "explain_single": 1500.0,
+    "explain_batch": 250.0,
+    "oov_observe": 50.0,
+}
+
+
+def load_inputs(limit):
+    import joblib
+    from train_model import transform_text
+
+    vectorizer = joblib.load(ROOT / "vectorizer.pkl")
+    model = joblib.load(ROOT / "model.pkl")
+    transformed = [transform_text(text) for text in load_messages()[:limit]]
+    return vectorizer, model, transformed
+
+
+def timed(fn, batches, repeat):
+    """Per-message microseconds of ``fn(batch)`` for every batch, ``repeat`` times."""
+    samples = []
+    for _ in range(repeat):
+        for batch in batches:
+            start = time.perf_counter()
+            fn(batch)
+            samples.append((time.perf_counter() - start) / len(batch) * 1e6)
+    samples.sort()
+    pick = lambda q: round(samples[min(len(samples) - 1, int(q * (len(samples) - 1)))], 2)  # noqa: E731
+    return {"p50_us": pick(0.50), "p95_us": pick(0.95), "max_us": round(samples[-1], 2), "samples": len(samples)}
+
+
+def case_explain(vectorizer, model, transformed, repeat):
+    from explain import Explainer
+
+    explainer = Explainer(vectorizer, model)
+    singles = [[text] for text in transformed[:200]]
+    batches = [transformed[i:i + 64] for i in range(0, len(transformed), 64)]
+    return {
+        # one-off per loaded model; the resident predict.py --serve worker caches it
+        "explain_build": timed(lambda batch: Explainer(vectorizer, model), [[None]] * 10, repeat),
+        "explain_single": timed(lambda batch: explainer.explain(batch, top_k=5), singles, repeat),
+        "explain_batch": timed(lambda batch: explainer.explain(batch, top_k=5), batches, repeat),
+    }
+
+
+def case_oov_monitor(vectorizer, model, transformed, repeat):
+    from oov_monitor import OOVMonitor
+
+    monitor = OOVMonitor(vectorizer.vocabulary_, tokenize=vectorizer.build_tokenizer())
+    spam = model.predict_proba(vectorizer.transform(transformed))[:, -1]
+    scored = [[(text, int(p >= 0.5), float(p))] for text, p in zip(transformed, spam)]
+
+    def observe(batch):
+        for text, prediction, probability in batch:
+            monitor.observe(text, prediction, probability)
+
+    return {"oov_observe": timed(observe, scored, repeat)}
+
+
+CASES = {
+    "explain": case_explain,
+    "oov_monitor": case_oov_monitor,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--case", action="append", choices=sorted(CASES), default=None)
+    parser.add_argument("--messages", type=int, default=1024)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--budget", action="append", default=[],
+                        help="override a budget, e.g. explain_batch=150")
+    parser.add_argument("--out", type=str, default=str(RESULTS_DIR))
+    args = parser.parse_args()
+
+    budgets = dict(BUDGETS_US)
+    for override in args.budget:
+        name, value = override.split("=", 1)
+        budgets[name] = float(value)
+
+    vectorizer, model, transformed = load_inputs(args.messages)
+    results = {}
+    for name in args.case or sorted(CASES):
+        results.update(CASES[name](vectorizer, model, transformed, args.repeat))
+
+    failed = []
+    for name, result in results.items():
+        budget = budgets.get(name)
+        result["budget_p95_us"] = budget
+        result["within_budget"] = budget is None or result["p95_us"] <= budget
+        if not result["within_budget"]:
+            failed.append(name)
+        print(f"{name:<24} p50 {result['p50_us']:>9} us  p95 {result['p95_us']:>9} us  budget {budget}")
+
+    report = {
+        "meta": {"commit": git_commit(), "timestamp": datetime.now(timezone.utc).isoformat(),
+                 "messages": len(transformed), "repeat": args.repeat},
+        "results": results,
+    }
+    out_dir = Path(args.out)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    out_path = out_dir / f"microbench-{(report['meta']['commit'] or 'nocommit')[:8]}-{stamp}.json"
+    out_path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"saved {out_path}")
+
+    if failed:
+        print("over budget: " + ", ".join(failed))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""Measure per-worker unique memory of ``serve.py`` in each loading mode.
+
+For every configuration the pre-fork server is started, driven with
+``--requests`` predictions from ``sms-spam.csv`` (so copy-on-write pages get
+touched the way real traffic touches them), and ``/proc/<pid>/smaps_rollup``
+is read for the master and every worker:
+
+- ``uss_kb``  -- Private_Clean + Private_Dirty, memory only that process holds
+- ``pss_kb``  -- proportional set size, shared pages split between sharers
+
+  python bench/worker_memory.py --workers 4 --requests 2000
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from loadtest import RESULTS_DIR, ROOT, HttpClient, free_port, git_commit, load_messages, wait_for_port  # noqa: E402
+
+CONFIGS = {
+    "no_preload": ["--no-preload"],
+    "preload_dict_vocabulary": ["--no-share-vocabulary"],
+    "preload_shared_vocabulary": [],
+}
+
+
+def smaps(pid):
+    values = {}
+    for line in Path(f"/proc/{pid}/smaps_rollup").read_text().splitlines()[1:]:
+        key, value = line.split(":", 1)
+        values[key] = int(value.split()[0])
+    return {
+        "rss_kb": values.get("Rss", 0),
+        "pss_kb": values.get("Pss", 0),
+        "uss_kb": values.get("Private_Clean", 0) + values.get("Private_Dirty", 0),
+    }
+
+
+def children(pid):
+    return [int(child) for child in Path(f"/proc/{pid}/task/{pid}/children").read_text().split()]
+
+
+def measure(name, extra_args, workers, requests, startup_timeout):
+    port = free_port()
+    proc = subprocess.Popen(
+        [sys.executable, str(ROOT / "serve.py"), "--workers", str(workers), "--port", str(port),
+         "--max-requests", "0", *extra_args],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        if not wait_for_port(port, timeout=startup_timeout):
+            raise RuntimeError(f"{name}: server did not start")
+        client = HttpClient("127.0.0.1", port, "/api/predict", timeout=60)
+        messages = load_messages()
+        statuses = {}
+        for i in range(requests):
+            status = client.send(messages[i % len(messages)])
+            statuses[status] = statuses.get(status, 0) + 1
+        time.sleep(0.5)
+
+        master = smaps(proc.pid)
+        per_worker = [smaps(pid) for pid in children(proc.pid)]
+        avg = lambda key: round(sum(w[key] for w in per_worker) / len(per_worker)) if per_worker else None  # noqa: E731
+        return {
+            "args": extra_args,
+            "requests": statuses,
+            "master": master,
+            "workers": per_worker,
+            "avg_worker_uss_kb": avg("uss_kb"),
+            "avg_worker_pss_kb": avg("pss_kb"),
+            "total_pss_kb": master["pss_kb"] + sum(w["pss_kb"] for w in per_worker),
+        }
+    finally:
+        proc.terminate()
+        proc.wait(60)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--startup-timeout", type=float, default=180.0)
+    parser.add_argument("--out", type=str, default=str(RESULTS_DIR))
+    args = parser.parse_args()
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "workers": args.workers,
+            "requests": args.requests,
+        },
+        "configs": {},
+    }
+    for name, extra_args in CONFIGS.items():
+        result = measure(name, extra_args, args.workers, args.requests, args.startup_timeout)
+        report["configs"][name] = result
+        print(f"{name:<28} avg worker USS {result['avg_worker_uss_kb']} kB, "
+              f"avg worker PSS {result['avg_worker_pss_kb']} kB, total PSS {result['total_pss_kb']} kB")
+
+    out_dir = Path(args.out)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    out_path = out_dir / f"worker-memory-{(report['meta']['commit'] or 'nocommit')[:8]}-{stamp}.json"
+    out_path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"saved {out_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -17,16 +17,17 @@ def get_db():
     return db
 
 # --- User Auth Helpers ---
-import bcrypt
 from datetime import datetime
 
+from sessions import check_password, hash_password
+
 def create_user(email, password):
     users = db['users']
     if not email or not password:
         return False, "Email and password required."
     if users.find_one({'email': email}):
         return False, "User already exists."
-    hashed = bcrypt.hashpw(password.encode(), bcrypt.gensalt())
+    hashed = hash_password(password)
     users.insert_one({
         'email': email,
         'password_hash': hashed,
@@ -42,4 +43,7 @@ def authenticate_user(email, password):
     hashed = user.get('password_hash')
     if not hashed:
         return False
-    return bcrypt.checkpw(password.encode(), hashed)
+    ok, needs_rehash = check_password(password, hashed)
+    if needs_rehash:
+        users.update_one({'_id': user['_id']}, {'$set': {'password_hash': hash_password(password)}})
+    return ok
@@ -0,0 +1,225 @@
+"""MinHash/LSH index of recently scored messages for reusing verdicts.
+
+Spam campaigns send many slight variants of the same text ("Txt WIN to 8xxxx"
+with different numbers or names). The index normalizes the raw text cheaply
+(lowercase, alphanumeric tokens, digit runs collapsed), shingles it into token
+n-grams and stores a MinHash signature per message bucketed by LSH bands. A
+lookup whose estimated Jaccard similarity clears ``threshold`` returns the
+stored verdict, so the NLTK + TF-IDF path can be skipped.
+
+Memory is bounded by ``max_entries`` and entries expire after ``ttl`` seconds.
+
+Run ``python neardup.py`` to replay ``sms-spam.csv`` through the index and
+record the reuse rate and accuracy impact in ``metrics.json``.
+"""
+import os
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+_MERSENNE = (1 << 31) - 1
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_DIGITS_RE = re.compile(r"[0-9]+")
+
+
+def normalize_tokens(text):
+    """Lowercased alphanumeric tokens with every digit run replaced by ``0``."""
+    return _TOKEN_RE.findall(_DIGITS_RE.sub("0", text.lower()))
+
+
+def shingles(tokens, size=2):
+    if len(tokens) < size:
+        return [" ".join(tokens)] if tokens else []
+    return [" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)]
+
+
+class NearDuplicateIndex:
+    """Bounded, time-evicting LSH index mapping signatures to verdicts."""
+
+    def __init__(self, threshold=0.7, num_perm=64, bands=16, shingle_size=2,
+                 max_entries=10000, ttl=3600.0, min_tokens=4, seed=1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.min_tokens = min_tokens
+
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, _MERSENNE, size=(num_perm, 1)).astype(np.uint64)
+        self._b = rng.randint(0, _MERSENNE, size=(num_perm, 1)).astype(np.uint64)
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (signature, verdict, inserted_at)
+        self._buckets = [dict() for _ in range(bands)]
+        self._next_key = 0
+        self.stats = {"lookups": 0, "hits": 0, "inserts": 0, "evictions": 0, "skipped": 0}
+
+    def signature(self, text):
+        """MinHash signature of ``text`` or ``None`` if it is too short to index."""
+        tokens = normalize_tokens(text)
+        if len(tokens) < self.min_tokens:
+            return None
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) & _MERSENNE for s in set(shingles(tokens, self.shingle_size))),
+            dtype=np.uint64,
+        )
+        return ((self._a * hashes + self._b) % _MERSENNE).min(axis=1)
+
+    def _band_keys(self, signature):
+        rows = self.rows
+        return [signature[i * rows:(i + 1) * rows].tobytes() for i in range(self.bands)]
+
+    def _evict(self, now):
+        while self._entries:
+            key, (signature, _, inserted_at) = next(iter(self._entries.items()))
+            if len(self._entries) <= self.max_entries and now - inserted_at < self.ttl:
+                break
+            self._entries.popitem(last=False)
+            for band, band_key in enumerate(self._band_keys(signature)):
+                bucket = self._buckets[band].get(band_key)
+                if bucket is not None:
+                    bucket.discard(key)
+                    if not bucket:
+                        del self._buckets[band][band_key]
+            self.stats["evictions"] += 1
+
+    def lookup(self, text, signature=None):
+        """Return ``(verdict, similarity)`` of the best live near-duplicate or ``None``."""
+        if signature is None:
+            signature = self.signature(text)
+        with self._lock:
+            self.stats["lookups"] += 1
+            if signature is None:
+                self.stats["skipped"] += 1
+                return None
+            now = time.monotonic()
+            self._evict(now)
+            candidates = set()
+            for band, band_key in enumerate(self._band_keys(signature)):
+                candidates.update(self._buckets[band].get(band_key, ()))
+            best = None
+            for key in candidates:
+                stored, verdict, _ = self._entries[key]
+                similarity = float(np.count_nonzero(stored == signature)) / self.num_perm
+                if similarity >= self.threshold and (best is None or similarity > best[1]):
+                    best = (verdict, similarity)
+            if best is not None:
+                self.stats["hits"] += 1
+            return best
+
+    def insert(self, text, verdict, signature=None):
+        """Remember ``verdict`` for ``text``; returns ``False`` if it was too short."""
+        if signature is None:
+            signature = self.signature(text)
+        if signature is None:
+            return False
+        with self._lock:
+            key = self._next_key
+            self._next_key += 1
+            self._entries[key] = (signature, verdict, time.monotonic())
+            for band, band_key in enumerate(self._band_keys(signature)):
+                self._buckets[band].setdefault(band_key, set()).add(key)
+            self.stats["inserts"] += 1
+            self._evict(time.monotonic())
+        return True
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+            size = len(self._entries)
+        return {
+            **stats,
+            "size": size,
+            "reuse_rate": stats["hits"] / stats["lookups"] if stats["lookups"] else 0.0,
+            "threshold": self.threshold,
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+        }
+
+
+def from_env():
+    """Build an index configured by ``NEARDUP_*`` environment variables, or ``None`` if disabled."""
+    if os.getenv("NEARDUP_ENABLED", "1").lower() in {"0", "false", "no"}:
+        return None
+    return NearDuplicateIndex(
+        threshold=float(os.getenv("NEARDUP_THRESHOLD", "0.7")),
+        max_entries=int(os.getenv("NEARDUP_MAX_ENTRIES", "10000")),
+        ttl=float(os.getenv("NEARDUP_TTL", "3600")),
+    )
+
+
+def evaluate(csv_path="sms-spam.csv", threshold=0.7):
+    """Replay the dataset in order, reusing near-duplicate verdicts, and compare with the model."""
+    import json
+    from pathlib import Path
+
+    import joblib
+    import pandas as pd
+
+    from train_model import transform_text
+
+    root = Path(__file__).resolve().parent
+    vectorizer = joblib.load(root / "vectorizer.pkl")
+    model = joblib.load(root / "model.pkl")
+
+    df = pd.read_csv(root / csv_path, encoding="latin-1", usecols=[0, 1], names=["label", "text"], header=0)
+    df["text"] = df["text"].fillna("")
+    labels = df["label"].map(lambda x: 1 if str(x).strip().lower() == "spam" else 0).tolist()
+    model_preds = model.predict(vectorizer.transform(df["text"].apply(transform_text).tolist())).tolist()
+
+    index = NearDuplicateIndex(threshold=threshold, max_entries=len(df), ttl=float("inf"))
+    served = []
+    reused = agreed = 0
+    for text, model_pred in zip(df["text"], model_preds):
+        signature = index.signature(text)
+        hit = index.lookup(text, signature=signature)
+        if hit is not None:
+            reused += 1
+            agreed += int(hit[0] == model_pred)
+            served.append(hit[0])
+        else:
+            served.append(model_pred)
+            index.insert(text, model_pred, signature=signature)
+
+    def accuracy(preds):
+        return sum(int(p == y) for p, y in zip(preds, labels)) / len(labels)
+
+    def spam_recall(preds):
+        spam = [p for p, y in zip(preds, labels) if y == 1]
+        return sum(spam) / len(spam) if spam else 0.0
+
+    report = {
+        "threshold": threshold,
+        "messages": len(labels),
+        "reuse_rate": reused / len(labels),
+        "reused_agreement_with_model": agreed / reused if reused else None,
+        "accuracy_model": accuracy(model_preds),
+        "accuracy_with_reuse": accuracy(served),
+        "spam_recall_model": spam_recall(model_preds),
+        "spam_recall_with_reuse": spam_recall(served),
+    }
+
+    metrics_path = root / "metrics.json"
+    metrics = json.loads(metrics_path.read_text(encoding="utf-8")) if metrics_path.exists() else {}
+    metrics["near_duplicate"] = report
+    metrics_path.write_text(json.dumps(metrics, indent=2), encoding="utf-8")
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threshold", type=float, default=0.7)
+    args = parser.parse_args()
+    print(json.dumps(evaluate(threshold=args.threshold), indent=2))
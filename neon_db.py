@@ -1,54 +1,121 @@
 import psycopg2
 from psycopg2.extras import RealDictCursor
+from psycopg2.pool import PoolError, ThreadedConnectionPool
 import os
+import threading
 from dotenv import load_dotenv
-import bcrypt
 from datetime import datetime
 
+from sessions import AuthBusy, check_password, hash_password
+from tracing import sql_comment, traced
+
 load_dotenv()
 
 NEON_DB_URL = os.getenv("NEON_DB_URL", "")
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+_DB_SPAN = {"db.system": "postgresql"}
+
+_pool = None
+_pool_slots = None
+
+def init_pool(minconn=1, maxconn=5):
+    """Create a shared connection pool used by all helpers in this module."""
+    global _pool, _pool_slots
+    if not NEON_DB_URL:
+        raise ValueError("NEON_DB_URL not set in environment variables")
+    if _pool is None:
+        _pool_slots = threading.BoundedSemaphore(maxconn)
+        _pool = ThreadedConnectionPool(minconn, maxconn, NEON_DB_URL)
+    return _pool
 
 def get_connection():
-    """Get a connection to Neon DB."""
+    """Get a connection to Neon DB (from the pool if one was initialized).
+
+    ``ThreadedConnectionPool.getconn`` fails at once when every connection is
+    out, so callers wait up to ``DB_POOL_TIMEOUT`` seconds for a free one
+    before ``PoolError`` is raised.
+    """
     if not NEON_DB_URL:
         raise ValueError("NEON_DB_URL not set in environment variables")
+    if _pool is not None:
+        if not _pool_slots.acquire(timeout=DB_POOL_TIMEOUT):
+            raise PoolError("connection pool exhausted")
+        try:
+            return _pool.getconn()
+        except Exception:
+            _pool_slots.release()
+            raise
     return psycopg2.connect(NEON_DB_URL)
 
+def release_connection(conn, discard=False):
+    """Return a connection to the pool, or close it when no pool is in use."""
+    if _pool is None:
+        conn.close()
+        return
+    try:
+        if not (discard or conn.closed):
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                discard = True
+        _pool.putconn(conn, close=discard or bool(conn.closed))
+    finally:
+        _pool_slots.release()
+
+def _run(work, cursor_factory=None):
+    """Return ``work(conn, cursor)`` run on a pooled connection.
+
+    Neon closes idle connections, so a pooled one can be dead without the pool
+    knowing. On ``OperationalError`` it is discarded and ``work`` retried once
+    on a fresh connection; other errors propagate.
+    """
+    for attempt in range(2):
+        conn = get_connection()
+        stale = False
+        try:
+            with conn.cursor(cursor_factory=cursor_factory) as cursor:
+                return work(conn, cursor)
+        except psycopg2.OperationalError:
+            stale = True
+            if attempt or _pool is None:
+                raise
+        finally:
+            release_connection(conn, discard=stale)
+
+@traced("db.init_db", _DB_SPAN)
 def init_db():
     """Initialize database tables if they don't exist."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    # Create users table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            id SERIAL PRIMARY KEY,
-            email VARCHAR(255) UNIQUE NOT NULL,
-            password_hash VARCHAR(255) NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    
-    # Create predictions table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS predictions (
-            id SERIAL PRIMARY KEY,
-            user_email VARCHAR(255) NOT NULL,
-            text TEXT NOT NULL,
-            transformed TEXT,
-            steps JSON,
-            prediction INT,
-            label VARCHAR(50),
-            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_email) REFERENCES users(email)
-        )
-    """)
-    
-    conn.commit()
-    cursor.close()
-    conn.close()
+    def work(conn, cursor):
+        # Create users table
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS users (
+                id SERIAL PRIMARY KEY,
+                email VARCHAR(255) UNIQUE NOT NULL,
+                password_hash VARCHAR(255) NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+        # Create predictions table
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS predictions (
+                id SERIAL PRIMARY KEY,
+                user_email VARCHAR(255) NOT NULL,
+                text TEXT NOT NULL,
+                transformed TEXT,
+                steps JSON,
+                prediction INT,
+                label VARCHAR(50),
+                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (user_email) REFERENCES users(email)
+            )
+        """)
+
+        conn.commit()
+
+    _run(work)
 
+@traced("db.create_user", _DB_SPAN)
 def create_user(email, password):
     """Create a new user with hashed password."""
     email = email.strip().lower() if email else ""
@@ -57,99 +124,108 @@ def create_user(email, password):
     if not email or not password:
         return False, "Email and password required."
     
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    try:
+    def work(conn, cursor):
         # Check if user exists
-        cursor.execute("SELECT id FROM users WHERE email = %s", (email,))
+        cursor.execute(sql_comment("SELECT id FROM users WHERE email = %s"), (email,))
         if cursor.fetchone():
             return False, "User already exists."
-        
+
         # Hash password and insert user
-        hashed = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-        cursor.execute(
-            "INSERT INTO users (email, password_hash) VALUES (%s, %s)",
+        hashed = hash_password(password).decode('utf-8')
+        cursor.execute(sql_comment(
+            "INSERT INTO users (email, password_hash) VALUES (%s, %s)"),
             (email, hashed)
         )
         conn.commit()
         return True, "User created."
+
+    try:
+        return _run(work)
     except Exception as e:
         return False, f"Error: {str(e)}"
-    finally:
-        cursor.close()
-        conn.close()
 
+@traced("db.authenticate_user", _DB_SPAN)
 def authenticate_user(email, password):
-    """Authenticate user by email and password."""
+    """Authenticate user by email and password.
+
+    The bcrypt check runs on the bounded pool in ``sessions`` (``AuthBusy`` is
+    raised when it is saturated) and hashes at an outdated cost are rehashed.
+    Database errors propagate rather than being reported as bad credentials.
+    """
     email = email.strip().lower() if email else ""
     password = password.strip() if password else ""
     
     if not email or not password:
         return False
     
-    conn = get_connection()
-    cursor = conn.cursor()
-    
+    def work(conn, cursor):
+        cursor.execute(sql_comment("SELECT password_hash FROM users WHERE email = %s"), (email,))
+        return cursor.fetchone()
+
+    row = _run(work)
+    if not row:
+        return False
+
+    # the connection is back in the pool before the slow bcrypt check
     try:
-        cursor.execute("SELECT password_hash FROM users WHERE email = %s", (email,))
-        row = cursor.fetchone()
-        if not row:
-            return False
-        
-        hashed_str = row[0]
-        # Convert to bytes if needed
-        if isinstance(hashed_str, str):
-            hashed_bytes = hashed_str.encode('utf-8')
-        else:
-            hashed_bytes = hashed_str
-        
-        return bcrypt.checkpw(password.encode('utf-8'), hashed_bytes)
-    except Exception as e:
+        ok, needs_rehash = check_password(password, row[0])
+    except AuthBusy:
+        raise
+    except Exception:
         return False
-    finally:
-        cursor.close()
-        conn.close()
+    if needs_rehash:
+        _rehash_password(email, password)
+    return ok
+
+def _rehash_password(email, password):
+    """Store a new hash at the configured bcrypt cost; failures are not fatal."""
+    try:
+        hashed = hash_password(password).decode('utf-8')
+    except Exception:
+        return
+
+    def work(conn, cursor):
+        cursor.execute(sql_comment("UPDATE users SET password_hash = %s WHERE email = %s"), (hashed, email))
+        conn.commit()
+
+    try:
+        _run(work)
+    except Exception:
+        pass
 
+@traced("db.save_prediction", _DB_SPAN)
 def save_prediction(user_email, text, transformed, steps, prediction, label):
     """Save a prediction to the database."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    try:
-        import json
-        steps_json = json.dumps(steps) if isinstance(steps, dict) else steps
-        cursor.execute(
+    import json
+    steps_json = json.dumps(steps) if isinstance(steps, dict) else steps
+
+    def work(conn, cursor):
+        cursor.execute(sql_comment(
             """INSERT INTO predictions 
                (user_email, text, transformed, steps, prediction, label) 
-               VALUES (%s, %s, %s, %s, %s, %s)""",
+               VALUES (%s, %s, %s, %s, %s, %s)"""),
             (user_email, text, transformed, steps_json, prediction, label)
         )
         conn.commit()
         return True
-    except Exception as e:
+
+    try:
+        return _run(work)
+    except Exception:
         return False
-    finally:
-        cursor.close()
-        conn.close()
 
+@traced("db.get_user_predictions", _DB_SPAN)
 def get_user_predictions(user_email, limit=50):
-    """Get all predictions for a user."""
-    conn = get_connection()
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
-    
-    try:
-        cursor.execute(
+    """Get all predictions for a user; query errors propagate so callers do not cache them."""
+    def work(conn, cursor):
+        cursor.execute(sql_comment(
             """SELECT id, text, transformed, steps, prediction, label, timestamp 
                FROM predictions 
                WHERE user_email = %s 
                ORDER BY timestamp DESC 
-               LIMIT %s""",
+               LIMIT %s"""),
             (user_email, limit)
         )
         return cursor.fetchall()
-    except Exception:
-        return []
-    finally:
-        cursor.close()
-        conn.close()
+
+    return _run(work, cursor_factory=RealDictCursor)
@@ -0,0 +1,177 @@
+"""Fixed-memory monitor of out-of-vocabulary tokens and scores in live traffic.
+
+Every message scored by the model has its cleaned tokens checked against the
+vectorizer vocabulary. Unseen tokens are counted in a count-min sketch and the
+most frequent ones kept in a small heavy-hitters list; per-class histograms of
+the spam probability sit alongside. All of it lives in a ring of time buckets
+(``bucket_seconds`` each), so any window up to ``bucket_seconds * buckets`` is
+answered by merging buckets and memory does not grow with traffic or drift.
+
+Count-min estimates never under-count; with ``depth`` rows of ``width``
+counters they over-count by at most ``e / width`` of the window's OOV tokens
+with probability ``1 - exp(-depth)``.
+"""
+import os
+import threading
+import time
+import zlib
+from array import array
+
+import numpy as np
+
+_MERSENNE = (1 << 31) - 1
+_CELL_CACHE_SIZE = 8192
+
+
+class _Bucket:
+    __slots__ = ("id", "messages", "tokens", "oov_tokens", "oov_messages", "sketch", "heavy", "heavy_min",
+                 "histogram")
+
+    def __init__(self, cells, histogram_cells):
+        self.id = None
+        self.sketch = array("I", bytes(4 * cells))
+        self.histogram = array("I", bytes(4 * histogram_cells))
+        self.reset(None)
+
+    def reset(self, bucket_id):
+        self.id = bucket_id
+        self.messages = self.tokens = self.oov_tokens = self.oov_messages = 0
+        self.heavy = {}  # token -> count-min estimate within this bucket
+        self.heavy_min = 0
+        if bucket_id is not None:
+            self.sketch = array("I", bytes(len(self.sketch) * 4))
+            self.histogram = array("I", bytes(len(self.histogram) * 4))
+
+
+class OOVMonitor:
+    """Sliding-window OOV rate, top unseen tokens and score histograms."""
+
+    def __init__(self, vocabulary, tokenize=str.split, classes=(0, 1), bucket_seconds=60, buckets=60,
+                 width=2048, depth=4, heavy_hitters=64, bins=10, windows=(300, 3600), seed=1):
+        self.vocabulary = vocabulary
+        self.tokenize = tokenize
+        self.classes = tuple(classes)
+        self.bucket_seconds = bucket_seconds
+        self.width = width
+        self.depth = depth
+        self.heavy_hitters = heavy_hitters
+        self.bins = bins
+        self.windows = tuple(w for w in windows if w <= bucket_seconds * buckets) or (bucket_seconds * buckets,)
+
+        rng = np.random.RandomState(seed)
+        self._hashes = [(int(a), int(b)) for a, b in zip(rng.randint(1, _MERSENNE, size=depth),
+                                                          rng.randint(0, _MERSENNE, size=depth))]
+        self._class_index = {label: i for i, label in enumerate(self.classes)}
+        self._cells = {}
+        self._lock = threading.Lock()
+        self._ring = [_Bucket(depth * width, len(self.classes) * bins) for _ in range(buckets)]
+
+    def _columns(self, token):
+        cells = self._cells.get(token)
+        if cells is None:
+            h = zlib.crc32(token.encode("utf-8"))
+            width = self.width
+            cells = tuple(row * width + ((a * h + b) % _MERSENNE) % width for row, (a, b) in enumerate(self._hashes))
+            # hot unseen tokens repeat; bound the cache rather than let it track the stream
+            if len(self._cells) >= _CELL_CACHE_SIZE:
+                self._cells.clear()
+            self._cells[token] = cells
+        return cells
+
+    def _bucket(self, now):
+        bucket_id = int(now // self.bucket_seconds)
+        bucket = self._ring[bucket_id % len(self._ring)]
+        if bucket.id != bucket_id:
+            bucket.reset(bucket_id)
+        return bucket
+
+    def observe(self, transformed, prediction=None, probability=None):
+        """Record one scored message: its cleaned text, predicted class and spam probability."""
+        tokens = self.tokenize(transformed)
+        vocabulary = self.vocabulary
+        unseen = [token for token in tokens if token not in vocabulary]
+        columns = [self._columns(token) for token in unseen]
+        class_index = self._class_index.get(prediction)
+
+        with self._lock:
+            bucket = self._bucket(time.time())
+            bucket.messages += 1
+            bucket.tokens += len(tokens)
+            if unseen:
+                bucket.oov_messages += 1
+                bucket.oov_tokens += len(unseen)
+                sketch = bucket.sketch
+                heavy = bucket.heavy
+                for token, cells in zip(unseen, columns):
+                    for cell in cells:
+                        sketch[cell] += 1
+                    estimate = min([sketch[cell] for cell in cells])
+                    if token in heavy or len(heavy) < self.heavy_hitters:
+                        heavy[token] = estimate
+                        if len(heavy) == self.heavy_hitters:
+                            bucket.heavy_min = min(heavy.values())
+                    elif estimate > bucket.heavy_min:
+                        del heavy[min(heavy, key=heavy.get)]
+                        heavy[token] = estimate
+                        bucket.heavy_min = min(heavy.values())
+            if class_index is not None and probability is not None:
+                slot = min(max(int(probability * self.bins), 0), self.bins - 1)
+                bucket.histogram[class_index * self.bins + slot] += 1
+
+    def window(self, seconds, top=20, tokens=()):
+        """Merge the buckets covering the last ``seconds`` into one summary."""
+        now_id = int(time.time() // self.bucket_seconds)
+        span = max(1, min(len(self._ring), int(-(-seconds // self.bucket_seconds))))
+        sketch = np.zeros(self.depth * self.width, dtype=np.int64)
+        histogram = np.zeros(len(self.classes) * self.bins, dtype=np.int64)
+        totals = {"messages": 0, "tokens": 0, "oov_tokens": 0, "oov_messages": 0}
+        candidates = set()
+        with self._lock:
+            for bucket in self._ring:
+                if bucket.id is None or not now_id - span < bucket.id <= now_id:
+                    continue
+                for key in totals:
+                    totals[key] += getattr(bucket, key)
+                sketch += np.frombuffer(bucket.sketch, dtype=np.uint32)
+                histogram += np.frombuffer(bucket.histogram, dtype=np.uint32)
+                candidates.update(bucket.heavy)
+
+        estimate = lambda token: int(sketch[list(self._columns(token))].min())  # noqa: E731
+        ranked = sorted(((estimate(token), token) for token in candidates), reverse=True)[:top]
+        histogram = histogram.reshape(len(self.classes), self.bins)
+        return {
+            **totals,
+            "seconds": span * self.bucket_seconds,
+            "oov_rate": totals["oov_tokens"] / totals["tokens"] if totals["tokens"] else 0.0,
+            "oov_message_rate": totals["oov_messages"] / totals["messages"] if totals["messages"] else 0.0,
+            "top_unseen": [{"token": token, "count": count} for count, token in ranked],
+            "estimates": {token: estimate(token) for token in tokens},
+            "score_histograms": {str(label): histogram[i].tolist() for i, label in enumerate(self.classes)},
+        }
+
+    def snapshot(self, windows=None, top=20, tokens=()):
+        return {
+            "vocabulary_size": len(self.vocabulary),
+            "bucket_seconds": self.bucket_seconds,
+            "max_window_seconds": self.bucket_seconds * len(self._ring),
+            "sketch": {"width": self.width, "depth": self.depth, "heavy_hitters": self.heavy_hitters},
+            "memory_bytes": sum(b.sketch.itemsize * len(b.sketch) + b.histogram.itemsize * len(b.histogram)
+                                for b in self._ring),
+            "score_bins": np.linspace(0.0, 1.0, self.bins + 1).round(4).tolist(),
+            "windows": {f"{int(w)}s": self.window(w, top=top, tokens=tokens) for w in (windows or self.windows)},
+        }
+
+
+def from_env(vocabulary, tokenize=str.split):
+    """Build a monitor configured by ``OOV_*`` environment variables, or ``None`` if disabled."""
+    if os.getenv("OOV_MONITOR_ENABLED", "1").lower() in {"0", "false", "no"}:
+        return None
+    return OOVMonitor(
+        vocabulary,
+        tokenize=tokenize,
+        bucket_seconds=int(os.getenv("OOV_BUCKET_SECONDS", "60")),
+        buckets=int(os.getenv("OOV_BUCKETS", "60")),
+        width=int(os.getenv("OOV_SKETCH_WIDTH", "2048")),
+        depth=int(os.getenv("OOV_SKETCH_DEPTH", "4")),
+        heavy_hitters=int(os.getenv("OOV_HEAVY_HITTERS", "64")),
+    )
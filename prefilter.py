@@ -0,0 +1,215 @@
+"""Cheap multi-pattern prefilter that runs on raw SMS text before the NB model.
+
+Patterns live in a JSON file (``patterns.json`` by default, override with
+``PREFILTER_PATTERNS``) and are compiled once into an Aho-Corasick automaton.
+Each pattern has an ``action``:
+
+- ``spam`` / ``ham``: short-circuit to that verdict without preprocessing
+- ``feature``: annotation only. The matched name is reported, but the verdict
+  still comes from the model, which already sees these words as TF-IDF
+  n-grams; adding them to the score again would count them twice.
+
+The file's mtime is checked at most every ``PREFILTER_RELOAD_INTERVAL``
+seconds (default 2) and the file is re-read when it changed, so pattern sets
+can be updated without restarting the process.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+DEFAULT_PATTERNS_PATH = Path(os.getenv("PREFILTER_PATTERNS", ROOT / "patterns.json"))
+RELOAD_INTERVAL = float(os.getenv("PREFILTER_RELOAD_INTERVAL", "2"))
+
+VERDICTS = {"spam": 1, "ham": 0}
+ACTIONS = set(VERDICTS) | {"feature"}
+
+
+class Automaton:
+    """Aho-Corasick automaton over lowercased patterns."""
+
+    def __init__(self, patterns):
+        # patterns: list of (needle, payload)
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [[]]
+        for needle, payload in patterns:
+            self._add(needle.lower(), payload)
+        self._build()
+
+    def _add(self, needle, payload):
+        state = 0
+        for char in needle:
+            nxt = self.goto[state].get(char)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[state][char] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append([])
+            state = nxt
+        self.out[state].append(payload)
+
+    def _build(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in self.goto[state].items():
+                queue.append(nxt)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[nxt] = self.goto[fallback].get(char, 0)
+                if self.fail[nxt] == nxt:
+                    self.fail[nxt] = 0
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def search(self, text):
+        """Return payloads of every pattern occurring in ``text``."""
+        goto, fail, out = self.goto, self.fail, self.out
+        state = 0
+        found = []
+        for char in text.lower():
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if out[state]:
+                found.extend(out[state])
+        return found
+
+
+def load_patterns(path):
+    """Read and validate a pattern file, returning a list of pattern dicts."""
+    with open(path, "r", encoding="utf-8") as file:
+        data = json.load(file)
+    entries = data.get("patterns", []) if isinstance(data, dict) else data
+
+    patterns = []
+    for entry in entries:
+        needle = str(entry.get("pattern", ""))
+        action = entry.get("action", "feature")
+        if not needle:
+            continue
+        if action not in ACTIONS:
+            raise ValueError(f"unknown prefilter action {action!r} for pattern {needle!r}")
+        patterns.append({"pattern": needle, "action": action, "name": entry.get("name") or needle})
+    return patterns
+
+
+class Prefilter:
+    """Thread-safe, hot-reloadable pattern prefilter with fast-path counters."""
+
+    def __init__(self, path=DEFAULT_PATTERNS_PATH, reload_interval=RELOAD_INTERVAL):
+        self.path = Path(path)
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._next_check = time.monotonic() + reload_interval
+        self._automaton = Automaton([])
+        self._pattern_count = 0
+        self.stats = {
+            "scanned": 0,
+            "matched": 0,
+            "short_circuited": 0,
+            "scan_seconds": 0.0,
+            "full_path_seconds": 0.0,
+            "full_path_count": 0,
+            "reloads": 0,
+            "last_error": None,
+        }
+        self.reload()
+
+    def reload(self, force=True):
+        """(Re)build the automaton from the pattern file.
+
+        Returns ``True`` if a new pattern set was loaded. A broken file keeps
+        the previous automaton in place and records the error in the stats.
+        """
+        try:
+            mtime = self.path.stat().st_mtime
+        except FileNotFoundError:
+            mtime = None
+        if not force and mtime == self._mtime:
+            return False
+
+        try:
+            patterns = load_patterns(self.path) if mtime is not None else []
+        except (OSError, ValueError) as error:
+            with self._lock:
+                self._mtime = mtime
+                self.stats["last_error"] = str(error)
+            return False
+
+        automaton = Automaton((p["pattern"], p) for p in patterns)
+        with self._lock:
+            self._automaton = automaton
+            self._pattern_count = len(patterns)
+            self._mtime = mtime
+            self.stats["reloads"] += 1
+            self.stats["last_error"] = None
+        return True
+
+    def scan(self, text):
+        """Match ``text`` against the pattern set.
+
+        Returns a dict with the matched pattern names and, when a verdict
+        pattern fired, the short-circuit ``prediction`` (spam wins over ham).
+        """
+        now = time.monotonic()
+        if now >= self._next_check:
+            # keep stat() off the per-message path
+            self._next_check = now + self.reload_interval
+            self.reload(force=False)
+        start = time.perf_counter()
+        hits = self._automaton.search(text)
+
+        names = []
+        verdict = None
+        for hit in hits:
+            if hit["name"] not in names:
+                names.append(hit["name"])
+            if hit["action"] in VERDICTS:
+                value = VERDICTS[hit["action"]]
+                verdict = value if verdict is None else max(verdict, value)
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self.stats["scanned"] += 1
+            self.stats["scan_seconds"] += elapsed
+            if names:
+                self.stats["matched"] += 1
+            if verdict is not None:
+                self.stats["short_circuited"] += 1
+
+        return {"matches": names, "prediction": verdict, "scan_us": round(elapsed * 1e6, 2)}
+
+    def record_full_path(self, seconds):
+        """Record the latency of one full preprocessing + model pass."""
+        with self._lock:
+            self.stats["full_path_seconds"] += seconds
+            self.stats["full_path_count"] += 1
+
+    def snapshot(self):
+        """Return counters plus derived fire rate and estimated latency saved."""
+        with self._lock:
+            stats = dict(self.stats)
+            patterns = self._pattern_count
+        scanned = stats["scanned"] or 1
+        full_avg = stats["full_path_seconds"] / stats["full_path_count"] if stats["full_path_count"] else 0.0
+        scan_avg = stats["scan_seconds"] / scanned
+        return {
+            "patterns": patterns,
+            "path": str(self.path),
+            "scanned": stats["scanned"],
+            "matched": stats["matched"],
+            "short_circuited": stats["short_circuited"],
+            "fire_rate": stats["short_circuited"] / scanned,
+            "avg_scan_us": round(scan_avg * 1e6, 2),
+            "avg_full_path_ms": round(full_avg * 1e3, 3),
+            "estimated_saved_ms": round(stats["short_circuited"] * max(full_avg - scan_avg, 0.0) * 1e3, 3),
+            "reloads": stats["reloads"],
+            "last_error": stats["last_error"],
+        }
@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""Re-score stored prediction history with the current (or a named) model.
+
+Rows are streamed in id order (a server-side cursor on Postgres), scored in
+chunks by a pool of worker processes and written back in bulk, either to a
+``prediction_rescores`` side table keyed by model version (default) or over
+the original ``prediction``/``label`` columns with ``--write-back``.
+
+Progress is checkpointed to a JSON file after every committed chunk, so a
+killed job picks up after the last committed id when started again.
+
+Examples:
+  python rescore.py --source postgres                      # NEON_DB_URL
+  python rescore.py --source sqlite --dsn history.db --workers 2
+  python rescore.py --source mongo --model pruned5000      # MONGO_URI / MONGO_DB
+
+``--model`` names a pair generated by ``train_model.py`` (none are shipped).
+"""
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+from collections import deque
+from multiprocessing import Pool
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+sys.path.append(str(ROOT / 'backend'))
+
+SIDE_TABLE = 'prediction_rescores'
+
+
+def label_for(prediction):
+    return 'spam' if int(prediction) == 1 else 'not_spam'
+
+
+def model_version(model_name):
+    """Stable version tag: model name plus a short hash of its pickle."""
+    name = model_name if model_name not in (None, 'default', 'model') else 'model'
+    path = ROOT / f'{name}.pkl'
+    if not path.exists():
+        path = ROOT / 'model.pkl'
+    digest = hashlib.sha1(path.read_bytes()).hexdigest()[:12]
+    return f'{name}-{digest}'
+
+
+# --- workers -----------------------------------------------------------------
+
+_vectorizer = None
+_model = None
+_transform = None
+
+
+def _init_worker(model_name):
+    global _vectorizer, _model, _transform
+    from predict import load_artifacts
+    from train_model import transform_text
+    _vectorizer, _model = load_artifacts(model_name)
+    _transform = transform_text
+
+
+def score_chunk(rows):
+    """Score ``[(id, text, previous_prediction), ...]`` in one vectorized pass."""
+    ids = [row[0] for row in rows]
+    texts = [_transform(row[1] or '') for row in rows]
+    X = _vectorizer.transform(texts)
+    preds = _model.predict(X).tolist()
+    try:
+        spam_probs = _model.predict_proba(X)[:, 1].tolist()
+    except Exception:
+        spam_probs = [None] * len(rows)
+    return [
+        (row_id, int(pred), prob, row[2])
+        for row_id, pred, prob, row in zip(ids, preds, spam_probs, rows)
+    ]
+
+
+# --- stores ------------------------------------------------------------------
+
+class SqliteStore:
+    """SQLite stand-in with the same ``predictions`` layout as ``neon_db``."""
+
+    def __init__(self, dsn):
+        self.conn = sqlite3.connect(dsn)
+
+    def ensure_side_table(self):
+        self.conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {SIDE_TABLE} (
+                prediction_id INTEGER NOT NULL,
+                model_version TEXT NOT NULL,
+                prediction INTEGER,
+                label TEXT,
+                spam_probability REAL,
+                previous_prediction INTEGER,
+                rescored_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (prediction_id, model_version)
+            )
+        """)
+        self.conn.commit()
+
+    def iter_rows(self, after_id, fetch_size):
+        cursor = self.conn.cursor()
+        cursor.arraysize = fetch_size
+        cursor.execute(
+            'SELECT id, text, prediction FROM predictions WHERE id > ? ORDER BY id',
+            (after_id if after_id is not None else -1,),
+        )
+        while True:
+            batch = cursor.fetchmany()
+            if not batch:
+                break
+            yield from batch
+
+    def write(self, results, version, write_back):
+        if write_back:
+            self.conn.executemany(
+                'UPDATE predictions SET prediction = ?, label = ? WHERE id = ?',
+                [(pred, label_for(pred), row_id) for row_id, pred, _, _ in results],
+            )
+        else:
+            self.conn.executemany(
+                f"""INSERT INTO {SIDE_TABLE}
+                    (prediction_id, model_version, prediction, label, spam_probability, previous_prediction)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (prediction_id, model_version) DO UPDATE SET
+                        prediction = excluded.prediction,
+                        label = excluded.label,
+                        spam_probability = excluded.spam_probability,
+                        rescored_at = CURRENT_TIMESTAMP""",
+                [(row_id, version, pred, label_for(pred), prob, prev) for row_id, pred, prob, prev in results],
+            )
+        self.conn.commit()
+
+    def parse_id(self, value):
+        return int(value)
+
+    def close(self):
+        self.conn.close()
+
+
+class PostgresStore:
+    """Neon/Postgres ``predictions`` table; reads via a named (server-side) cursor."""
+
+    def __init__(self, dsn):
+        import psycopg2
+        from psycopg2.extras import execute_values
+        self._execute_values = execute_values
+        self.read_conn = psycopg2.connect(dsn)
+        self.write_conn = psycopg2.connect(dsn)
+
+    def ensure_side_table(self):
+        with self.write_conn.cursor() as cursor:
+            cursor.execute(f"""
+                CREATE TABLE IF NOT EXISTS {SIDE_TABLE} (
+                    prediction_id INT NOT NULL,
+                    model_version VARCHAR(100) NOT NULL,
+                    prediction INT,
+                    label VARCHAR(50),
+                    spam_probability DOUBLE PRECISION,
+                    previous_prediction INT,
+                    rescored_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (prediction_id, model_version)
+                )
+            """)
+        self.write_conn.commit()
+
+    def iter_rows(self, after_id, fetch_size):
+        with self.read_conn.cursor(name='rescore_stream') as cursor:
+            cursor.itersize = fetch_size
+            cursor.execute(
+                'SELECT id, text, prediction FROM predictions WHERE id > %s ORDER BY id',
+                (after_id if after_id is not None else -1,),
+            )
+            yield from cursor
+        self.read_conn.rollback()
+
+    def write(self, results, version, write_back):
+        with self.write_conn.cursor() as cursor:
+            if write_back:
+                self._execute_values(
+                    cursor,
+                    """UPDATE predictions AS p SET prediction = v.prediction, label = v.label
+                       FROM (VALUES %s) AS v (id, prediction, label)
+                       WHERE p.id = v.id""",
+                    [(row_id, pred, label_for(pred)) for row_id, pred, _, _ in results],
+                )
+            else:
+                self._execute_values(
+                    cursor,
+                    f"""INSERT INTO {SIDE_TABLE}
+                        (prediction_id, model_version, prediction, label, spam_probability, previous_prediction)
+                        VALUES %s
+                        ON CONFLICT (prediction_id, model_version) DO UPDATE SET
+                            prediction = EXCLUDED.prediction,
+                            label = EXCLUDED.label,
+                            spam_probability = EXCLUDED.spam_probability,
+                            rescored_at = CURRENT_TIMESTAMP""",
+                    [(row_id, version, pred, label_for(pred), prob, prev) for row_id, pred, prob, prev in results],
+                )
+        self.write_conn.commit()
+
+    def parse_id(self, value):
+        return int(value)
+
+    def close(self):
+        self.read_conn.close()
+        self.write_conn.close()
+
+
+class MongoStore:
+    """``predictions`` collection written by ``backend/server.js``."""
+
+    def __init__(self, dsn, db_name):
+        from pymongo import MongoClient, UpdateOne
+        self._update_one = UpdateOne
+        self.client = MongoClient(dsn)
+        self.db = self.client[db_name]
+
+    def ensure_side_table(self):
+        self.db[SIDE_TABLE].create_index([('prediction_id', 1), ('model_version', 1)], unique=True)
+
+    def iter_rows(self, after_id, fetch_size):
+        query = {'_id': {'$gt': after_id}} if after_id is not None else {}
+        cursor = self.db['predictions'].find(query, {'text': 1, 'prediction': 1}).sort('_id', 1).batch_size(fetch_size)
+        for doc in cursor:
+            yield doc['_id'], doc.get('text'), doc.get('prediction')
+
+    def write(self, results, version, write_back):
+        if write_back:
+            ops = [
+                self._update_one({'_id': row_id}, {'$set': {'prediction': pred, 'label': label_for(pred)}})
+                for row_id, pred, _, _ in results
+            ]
+            self.db['predictions'].bulk_write(ops, ordered=False)
+        else:
+            ops = [
+                self._update_one(
+                    {'prediction_id': row_id, 'model_version': version},
+                    {'$set': {
+                        'prediction': pred,
+                        'label': label_for(pred),
+                        'spam_probability': prob,
+                        'previous_prediction': prev,
+                        'rescored_at': time.time(),
+                    }},
+                    upsert=True,
+                )
+                for row_id, pred, prob, prev in results
+            ]
+            self.db[SIDE_TABLE].bulk_write(ops, ordered=False)
+
+    def parse_id(self, value):
+        from bson import ObjectId
+        return ObjectId(value) if ObjectId.is_valid(value) else value
+
+    def close(self):
+        self.client.close()
+
+
+def open_store(source, dsn):
+    if source == 'sqlite':
+        return SqliteStore(dsn or 'predictions.db')
+    if source == 'postgres':
+        dsn = dsn or os.getenv('NEON_DB_URL', '')
+        if not dsn:
+            raise ValueError('NEON_DB_URL not set in environment variables')
+        return PostgresStore(dsn)
+    if source == 'mongo':
+        return MongoStore(dsn or os.getenv('MONGO_URI', 'mongodb://localhost:27017'),
+                          os.getenv('MONGO_DB', 'sms_spam_db'))
+    raise ValueError(f'unknown source: {source}')
+
+
+# --- checkpointing -----------------------------------------------------------
+
+def load_checkpoint(path, version):
+    if path.exists():
+        state = json.loads(path.read_text(encoding='utf-8'))
+        if state.get('model_version') == version:
+            return state
+    return {'model_version': version, 'last_id': None, 'processed': 0, 'changed': 0,
+            'transitions': {}, 'done': False}
+
+
+def save_checkpoint(path, state):
+    tmp = path.with_suffix(path.suffix + '.tmp')
+    tmp.write_text(json.dumps(state, indent=2, default=str), encoding='utf-8')
+    os.replace(tmp, path)
+
+
+def chunked(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def run(store, version, model_name, checkpoint_path, chunk_size=500, workers=2, write_back=False):
+    """Stream, score and write back every row after the checkpoint; returns the final state."""
+    state = load_checkpoint(checkpoint_path, version)
+    state['source'] = type(store).__name__
+    state['done'] = False
+    after_id = store.parse_id(state['last_id']) if state['last_id'] is not None else None
+    if not write_back:
+        store.ensure_side_table()
+
+    started = time.perf_counter()
+
+    def commit(results):
+        store.write(results, version, write_back)
+        for _, pred, _, prev in results:
+            if prev is not None and int(prev) != pred:
+                state['changed'] += 1
+                key = f'{int(prev)}->{pred}'
+                state['transitions'][key] = state['transitions'].get(key, 0) + 1
+        state['processed'] += len(results)
+        state['last_id'] = results[-1][0]
+        save_checkpoint(checkpoint_path, state)
+        print(f"rescored {state['processed']} rows (last id {state['last_id']})", flush=True)
+
+    rows = store.iter_rows(after_id, fetch_size=chunk_size)
+    if workers <= 0:
+        _init_worker(model_name)
+        for chunk in chunked(rows, chunk_size):
+            commit(score_chunk(chunk))
+    else:
+        # keep a bounded window of chunks in flight so the stream is never
+        # pulled into memory faster than the workers can score it
+        with Pool(workers, initializer=_init_worker, initargs=(model_name,)) as pool:
+            pending = deque()
+            for chunk in chunked(rows, chunk_size):
+                pending.append(pool.apply_async(score_chunk, (chunk,)))
+                while len(pending) >= workers * 2:
+                    commit(pending.popleft().get())
+            while pending:
+                commit(pending.popleft().get())
+
+    state['done'] = True
+    state['elapsed_seconds'] = round(time.perf_counter() - started, 3)
+    save_checkpoint(checkpoint_path, state)
+    return state
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--source', choices=['postgres', 'sqlite', 'mongo'], default='postgres')
+    parser.add_argument('--dsn', type=str, default=None,
+                        help='connection string / sqlite path (defaults to NEON_DB_URL or MONGO_URI)')
+    parser.add_argument('--model', type=str, default='default')
+    parser.add_argument('--version', type=str, default=None, help='model version tag for the side table')
+    parser.add_argument('--chunk-size', type=int, default=500)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='scoring processes (0 scores in the main process)')
+    parser.add_argument('--write-back', action='store_true',
+                        help='overwrite predictions.prediction/label instead of the side table')
+    parser.add_argument('--checkpoint', type=str, default=None)
+    args = parser.parse_args()
+
+    version = args.version or model_version(args.model)
+    mode = 'writeback' if args.write_back else 'side'
+    checkpoint = Path(args.checkpoint or f'rescore-{args.source}-{version}-{mode}.checkpoint.json')
+    store = open_store(args.source, args.dsn)
+    try:
+        state = run(store, version, args.model, checkpoint, args.chunk_size, args.workers, args.write_back)
+    finally:
+        store.close()
+    print(json.dumps(state, indent=2, default=str))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""Pre-fork multi-worker server for the Flask API in ``api/index.py``.
+
+The master imports the app once (NLTK corpora, ``vectorizer.pkl``,
+``model.pkl``), runs the warmup from ``warmup.py`` so lazily loaded corpora
+are resident, swaps the vocabulary for a buffer-backed ``FrozenVocabulary``,
+moves everything into the GC's permanent generation and then forks the
+workers. Workers share
+those pages copy-on-write instead of each holding a private copy.
+
+Workers are recycled after ``--max-requests`` (plus jitter); ``SIGHUP`` on the
+master rolls every worker gracefully, ``SIGTERM``/``SIGINT`` shuts down.
+
+  python serve.py --workers 4 --port 8000
+  python serve.py --workers 4 --no-preload      # old behaviour, for comparison
+"""
+import argparse
+import gc
+import os
+import random
+import signal
+import socket
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+sys.path.append(str(ROOT))
+sys.path.append(str(ROOT / "api"))
+
+
+def load_app(share_vocabulary=True):
+    """Import the Flask app and get it ready to be shared by forked workers."""
+    # warm on this thread: a background warmup thread would not survive fork,
+    # and workers should inherit resident corpora and a ready /api/ready
+    os.environ.setdefault("WARMUP_MODE", "sync")
+    import index
+
+    if share_vocabulary:
+        from shared_vocab import freeze_vectorizer
+        freeze_vectorizer(index.VECTORIZER)
+        if index.OOV_MONITOR is not None:
+            # drop the monitor's reference to the dict so it can be freed before fork
+            index.OOV_MONITOR.vocabulary = index.VECTORIZER.vocabulary_
+    warmup = index.WARMUP.snapshot()
+    print(f"warmup {warmup['state']}: {warmup['timings'] or warmup['error']}", flush=True)
+    return index.app
+
+
+def bind_socket(host, port, backlog=128):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    # several workers wait on the same socket; the ones that lose the accept
+    # race must get EAGAIN instead of blocking
+    sock.setblocking(False)
+    return sock
+
+
+def worker_main(sock, host, app, max_requests, share_vocabulary):
+    """Serve requests from the inherited socket until recycled or told to stop."""
+    from werkzeug.serving import make_server
+
+    stopping = False
+
+    def request_stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGHUP, signal.SIG_DFL)
+    gc.enable()
+
+    if app is None:
+        app = load_app(share_vocabulary)
+
+    served = 0
+
+    def counting_app(environ, start_response):
+        nonlocal served
+        served += 1
+        return app(environ, start_response)
+
+    server = make_server(host, sock.getsockname()[1], counting_app, fd=sock.fileno())
+    server.timeout = 1.0
+    while not stopping and (not max_requests or served < max_requests):
+        server.handle_request()
+    server.server_close()
+    # os._exit skips atexit, so hand buffered spans to the exporter now
+    import tracing
+    tracing.flush()
+    os._exit(0)
+
+
+class Master:
+    def __init__(self, args):
+        self.args = args
+        self.workers = set()
+        self.stopping = False
+        self.rolling = False
+        self.app = None
+        self.sock = None
+
+    def spawn(self):
+        max_requests = self.args.max_requests
+        if max_requests:
+            max_requests += random.randint(0, self.args.max_requests_jitter)
+        pid = os.fork()
+        if pid == 0:
+            worker_main(self.sock, self.args.host, self.app, max_requests, self.args.share_vocabulary)
+        self.workers.add(pid)
+        return pid
+
+    def roll(self):
+        """Replace every worker one by one, starting the new one first."""
+        for pid in list(self.workers):
+            self.spawn()
+            self._terminate(pid)
+
+    def _terminate(self, pid):
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            self.workers.discard(pid)
+
+    def reap(self):
+        while True:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            was_worker = pid in self.workers
+            self.workers.discard(pid)
+            if was_worker and not self.stopping and len(self.workers) < self.args.workers:
+                self.spawn()
+
+    def run(self):
+        args = self.args
+        # keep the collector from touching (and un-sharing) objects while loading
+        gc.disable()
+        if args.preload:
+            self.app = load_app(args.share_vocabulary)
+            gc.collect()
+            gc.freeze()
+        self.sock = bind_socket(args.host, args.port)
+
+        def on_stop(signum, frame):
+            self.stopping = True
+
+        def on_hup(signum, frame):
+            self.rolling = True
+
+        signal.signal(signal.SIGTERM, on_stop)
+        signal.signal(signal.SIGINT, on_stop)
+        signal.signal(signal.SIGHUP, on_hup)
+
+        for _ in range(args.workers):
+            self.spawn()
+        print(f"master {os.getpid()} serving on http://{args.host}:{args.port} with "
+              f"{args.workers} workers (preload={args.preload})", flush=True)
+
+        while not self.stopping:
+            if self.rolling:
+                self.rolling = False
+                self.roll()
+            self.reap()
+            time.sleep(0.2)
+
+        for pid in list(self.workers):
+            self._terminate(pid)
+        deadline = time.monotonic() + args.graceful_timeout
+        while self.workers and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.1)
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        self.sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--max-requests", type=int, default=10000,
+                        help="recycle a worker after this many requests (0 disables)")
+    parser.add_argument("--max-requests-jitter", type=int, default=1000)
+    parser.add_argument("--graceful-timeout", type=float, default=30.0)
+    parser.add_argument("--no-preload", dest="preload", action="store_false",
+                        help="load the model in every worker after fork")
+    parser.add_argument("--no-share-vocabulary", dest="share_vocabulary", action="store_false",
+                        help="keep the vectorizer's dict vocabulary")
+    Master(parser.parse_args()).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Signed session tokens and off-thread bcrypt for the login paths.
+
+``bcrypt.checkpw`` at the default cost is deliberately ~100+ ms of CPU. Two
+things keep it off the hot path:
+
+- after one successful password check the caller gets a signed, expiring
+  token (HMAC-SHA256 over ``{"sub", "iat", "exp"}``) that is verified in
+  microseconds without bcrypt or a database round-trip. Renewing it keeps
+  ``iat``, so a session ends ``SESSION_MAX_AGE`` after the password check;
+- password hashing/checking runs in a small bounded thread pool
+  (``BCRYPT_WORKERS`` threads, at most ``BCRYPT_MAX_PENDING`` queued jobs),
+  so a login burst cannot take every core away from prediction traffic.
+  Jobs beyond the bound raise ``AuthBusy``.
+
+Hashes whose cost differs from ``BCRYPT_ROUNDS`` are reported by
+``check_password`` so callers can rehash transparently after a good login.
+
+Set ``SESSION_SECRET`` so tokens survive restarts and are valid across
+processes; without it a random per-process secret is used.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+SESSION_SECRET = (os.getenv("SESSION_SECRET") or "").encode("utf-8") or os.urandom(32)
+SESSION_TTL = int(os.getenv("SESSION_TTL", "3600"))
+SESSION_MAX_AGE = int(os.getenv("SESSION_MAX_AGE", "86400"))
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", "2"))
+BCRYPT_MAX_PENDING = int(os.getenv("BCRYPT_MAX_PENDING", "32"))
+
+
+class AuthBusy(Exception):
+    """Raised when the bcrypt pool already has ``BCRYPT_MAX_PENDING`` jobs."""
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def issue_token(email, ttl=None, auth_time=None):
+    """Return a signed token for ``email`` valid for ``ttl`` seconds.
+
+    ``auth_time`` is when the password was last checked (now by default). No
+    token outlives ``auth_time + SESSION_MAX_AGE``, however often it is renewed.
+    """
+    now = int(time.time())
+    auth_time = now if auth_time is None else int(auth_time)
+    expires = min(now + (ttl or SESSION_TTL), auth_time + SESSION_MAX_AGE)
+    payload = json.dumps({"sub": email, "iat": auth_time, "exp": expires},
+                         separators=(",", ":")).encode("utf-8")
+    body = _b64encode(payload)
+    signature = hmac.new(SESSION_SECRET, body.encode("ascii"), hashlib.sha256).digest()
+    return f"{body}.{_b64encode(signature)}"
+
+
+def decode_token(token):
+    """Return the payload of a valid, unexpired token, else ``None``."""
+    if not token or not isinstance(token, str) or not token.isascii() or token.count(".") != 1:
+        return None
+    body, signature = token.split(".")
+    expected = hmac.new(SESSION_SECRET, body.encode("ascii"), hashlib.sha256).digest()
+    try:
+        if not hmac.compare_digest(_b64decode(signature), expected):
+            return None
+        payload = json.loads(_b64decode(body))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(payload, dict) or payload.get("exp", 0) < time.time():
+        return None
+    return payload
+
+
+def verify_token(token):
+    """Return the email a valid, unexpired token was issued for, else ``None``."""
+    payload = decode_token(token)
+    return payload.get("sub") if payload is not None else None
+
+
+def renew_token(token):
+    """Issue a fresh token for a valid one, keeping its original ``auth_time``.
+
+    Returns ``None`` once ``SESSION_MAX_AGE`` has passed since the password
+    check, so a leaked token cannot be kept alive by renewing it.
+    """
+    payload = decode_token(token)
+    if payload is None or not isinstance(payload.get("iat"), int):
+        return None
+    if time.time() >= payload["iat"] + SESSION_MAX_AGE:
+        return None
+    return issue_token(payload.get("sub"), auth_time=payload["iat"])
+
+
+class _BoundedPool:
+    def __init__(self, workers, max_pending):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    def run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise AuthBusy("too many concurrent password checks")
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result()
+
+
+_pool = _BoundedPool(BCRYPT_WORKERS, BCRYPT_MAX_PENDING)
+
+
+def _to_bytes(value):
+    return value.encode("utf-8") if isinstance(value, str) else value
+
+
+def hash_cost(hashed):
+    """Cost factor of a ``$2b$12$...`` hash, or ``None`` if it cannot be parsed."""
+    try:
+        return int(_to_bytes(hashed).split(b"$")[2])
+    except (IndexError, ValueError, AttributeError):
+        return None
+
+
+def hash_password(password):
+    """bcrypt hash at ``BCRYPT_ROUNDS``, computed on the bounded pool."""
+    return _pool.run(lambda: bcrypt.hashpw(_to_bytes(password), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)))
+
+
+def check_password(password, hashed):
+    """Return ``(ok, needs_rehash)``, checking on the bounded pool."""
+    hashed = _to_bytes(hashed)
+    ok = _pool.run(bcrypt.checkpw, _to_bytes(password), hashed)
+    return ok, ok and hash_cost(hashed) != BCRYPT_ROUNDS
@@ -0,0 +1,74 @@
+"""Copy-on-write friendly replacement for a fitted vectorizer's ``vocabulary_``.
+
+After a pre-fork master loads ``vectorizer.pkl``, the vocabulary is a dict of
+~20k ``str`` keys and ``numpy.int64`` values. Every lookup in a worker bumps
+the refcount of the returned value object, which writes to (and un-shares) the
+page it lives on, so over time each worker ends up with a private copy of most
+of the vocabulary.
+
+``FrozenVocabulary`` stores the same mapping in three flat numpy buffers (term
+bytes, offsets and an open-addressing hash table) and builds fresh Python
+objects per lookup, so the shared pages are only ever read.
+"""
+import zlib
+from collections.abc import Mapping
+
+import numpy as np
+
+
+class FrozenVocabulary(Mapping):
+    """Read-only ``term -> feature index`` mapping backed by numpy buffers."""
+
+    def __init__(self, vocabulary):
+        items = sorted(vocabulary.items(), key=lambda item: int(item[1]))
+        encoded = [term.encode("utf-8") for term, _ in items]
+
+        self._blob = b"".join(encoded)
+        self._offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(key) for key in encoded], out=self._offsets[1:])
+        self._indices = np.array([int(index) for _, index in items], dtype=np.int64)
+
+        size = 1
+        while size < 2 * max(len(encoded), 1):
+            size <<= 1
+        self._mask = size - 1
+        self._slots = np.full(size, -1, dtype=np.int64)
+        for position, key in enumerate(encoded):
+            slot = zlib.crc32(key) & self._mask
+            while self._slots[slot] != -1:
+                slot = (slot + 1) & self._mask
+            self._slots[slot] = position
+
+    def _key(self, position):
+        return self._blob[self._offsets[position]:self._offsets[position + 1]]
+
+    def __getitem__(self, term):
+        if not isinstance(term, str):
+            raise KeyError(term)
+        key = term.encode("utf-8")
+        slots, mask = self._slots, self._mask
+        slot = zlib.crc32(key) & mask
+        while True:
+            position = slots[slot]
+            if position == -1:
+                raise KeyError(term)
+            if self._key(position) == key:
+                return int(self._indices[position])
+            slot = (slot + 1) & mask
+
+    def __iter__(self):
+        for position in range(len(self._indices)):
+            yield self._key(position).decode("utf-8")
+
+    def __len__(self):
+        return len(self._indices)
+
+    def nbytes(self):
+        return len(self._blob) + self._offsets.nbytes + self._indices.nbytes + self._slots.nbytes
+
+
+def freeze_vectorizer(vectorizer):
+    """Swap ``vectorizer.vocabulary_`` for a ``FrozenVocabulary`` in place."""
+    if not isinstance(vectorizer.vocabulary_, FrozenVocabulary):
+        vectorizer.vocabulary_ = FrozenVocabulary(vectorizer.vocabulary_)
+    return vectorizer
@@ -0,0 +1,81 @@
+import time
+
+import bcrypt
+import pytest
+
+import sessions
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_700_000_000.0]
+    monkeypatch.setattr(sessions.time, "time", lambda: now[0])
+    return now
+
+
+def test_token_round_trip(clock):
+    token = sessions.issue_token("a@b.c")
+    assert sessions.verify_token(token) == "a@b.c"
+    assert sessions.decode_token(token)["iat"] == int(clock[0])
+
+
+def test_tampered_token_is_rejected(clock):
+    body, signature = sessions.issue_token("a@b.c").split(".")
+    forged = sessions._b64encode(b'{"sub":"admin@b.c","iat":1700000000,"exp":9999999999}')
+    assert sessions.verify_token(f"{forged}.{signature}") is None
+    assert sessions.verify_token(f"{body}.{signature[:-2]}AA") is None
+    assert sessions.verify_token(f"{body}.") is None
+
+
+def test_token_signed_with_another_secret_is_rejected(clock, monkeypatch):
+    token = sessions.issue_token("a@b.c")
+    monkeypatch.setattr(sessions, "SESSION_SECRET", b"another secret")
+    assert sessions.verify_token(token) is None
+
+
+def test_expired_token_is_rejected(clock):
+    token = sessions.issue_token("a@b.c", ttl=60)
+    clock[0] += 61
+    assert sessions.verify_token(token) is None
+
+
+@pytest.mark.parametrize("token", [None, "", "no-dot", "a.b.c", "é.abc", "abc.é", "%%%.###", 42])
+def test_malformed_token_is_rejected(token):
+    assert sessions.verify_token(token) is None
+
+
+def test_renewal_keeps_auth_time_and_stops_at_max_age(clock, monkeypatch):
+    monkeypatch.setattr(sessions, "SESSION_TTL", 3600)
+    monkeypatch.setattr(sessions, "SESSION_MAX_AGE", 3 * 3600)
+    token = sessions.issue_token("a@b.c")
+    issued_at = int(clock[0])
+
+    for _ in range(2):
+        clock[0] += 3000
+        token = sessions.renew_token(token)
+        assert sessions.decode_token(token)["iat"] == issued_at
+
+    # the next renewal is capped at iat + SESSION_MAX_AGE, not now + SESSION_TTL
+    clock[0] += 3000
+    token = sessions.renew_token(token)
+    assert sessions.decode_token(token)["exp"] == issued_at + 3 * 3600
+
+    clock[0] = issued_at + 3 * 3600
+    assert sessions.renew_token(token) is None
+    clock[0] += 1
+    assert sessions.verify_token(token) is None
+
+
+def test_token_without_auth_time_cannot_be_renewed(clock):
+    body = sessions._b64encode(b'{"sub":"a@b.c","exp":%d}' % (int(time.time()) + 60))
+    signature = sessions.hmac.new(sessions.SESSION_SECRET, body.encode("ascii"), sessions.hashlib.sha256).digest()
+    token = f"{body}.{sessions._b64encode(signature)}"
+    assert sessions.verify_token(token) == "a@b.c"
+    assert sessions.renew_token(token) is None
+
+
+def test_check_password_reports_rehash_for_other_cost(monkeypatch):
+    monkeypatch.setattr(sessions, "BCRYPT_ROUNDS", 5)
+    hashed = bcrypt.hashpw(b"secret", bcrypt.gensalt(rounds=4))
+    assert sessions.check_password("secret", hashed.decode("utf-8")) == (True, True)
+    assert sessions.check_password("wrong", hashed) == (False, False)
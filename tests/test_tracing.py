@@ -0,0 +1,29 @@
+import pytest
+
+import tracing
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+SPAN_ID = "00f067aa0ba902b7"
+
+
+def test_parse_traceparent():
+    assert tracing.parse_traceparent(f"00-{TRACE_ID}-{SPAN_ID}-01") == (TRACE_ID, SPAN_ID, True)
+    assert tracing.parse_traceparent(f" 00-{TRACE_ID}-{SPAN_ID}-00 ") == (TRACE_ID, SPAN_ID, False)
+
+
+@pytest.mark.parametrize("header", [
+    None,
+    "",
+    42,
+    f"00-{TRACE_ID}-{SPAN_ID}",
+    f"00-+{'a' * 31}-{SPAN_ID}-01",
+    f"00-{'a_' * 15}ab-{SPAN_ID}-01",
+    f"zz-{TRACE_ID}-{SPAN_ID}-01",
+    f"ff-{TRACE_ID}-{SPAN_ID}-01",
+    f"00-{TRACE_ID.upper()}-{SPAN_ID}-01",
+    f"00-{'0' * 32}-{SPAN_ID}-01",
+    f"00-{TRACE_ID}-{'0' * 16}-01",
+    f"00-{TRACE_ID}-{SPAN_ID}-0g",
+])
+def test_malformed_traceparent_is_rejected(header):
+    assert tracing.parse_traceparent(header) is None
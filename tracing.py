@@ -0,0 +1,293 @@
+"""Minimal request tracing with W3C ``traceparent`` propagation and OTLP/JSON export.
+
+Spans are exported in the OTLP/JSON trace format, either appended one batch
+per line to ``TRACE_EXPORT_PATH`` or POSTed to ``TRACE_EXPORT_URL`` (an OTLP
+HTTP endpoint such as ``http://localhost:4318/v1/traces``; run
+``python tracing.py collect`` for a local stand-in collector). With neither
+set tracing is off and every call returns a shared no-op span.
+
+Head sampling: new traces are kept with probability ``TRACE_SAMPLE_RATIO``
+(default 0.01); traces started upstream follow the caller's sampled flag.
+``backend/tracing.js`` is the Node counterpart.
+"""
+import atexit
+import contextvars
+import functools
+import json
+import os
+import random
+import re
+import threading
+import time
+import urllib.request
+
+SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "sms-spam-python")
+EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH", "")
+EXPORT_URL = os.getenv("TRACE_EXPORT_URL", "")
+SAMPLE_RATIO = float(os.getenv("TRACE_SAMPLE_RATIO", "0.01"))
+FLUSH_INTERVAL = float(os.getenv("TRACE_FLUSH_INTERVAL", "2"))
+MAX_BATCH = 512
+
+KIND_INTERNAL, KIND_SERVER, KIND_CLIENT = 1, 2, 3
+
+# same pattern as backend/tracing.js; version ff is reserved as invalid. Lowercase hex only,
+# so parsed ids are safe to echo into response headers and SQL comments.
+_TRACEPARENT = re.compile(r"^(?!ff)[0-9a-f]{2}-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})")
+
+_current = contextvars.ContextVar("current_span", default=None)
+
+
+class _NoopSpan:
+    sampled = False
+    traceparent = None
+
+    def set_attribute(self, key, value):
+        pass
+
+    def record_error(self, error):
+        pass
+
+    def end(self):
+        pass
+
+
+NOOP = _NoopSpan()
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "sampled", "kind",
+                 "start_ns", "end_ns", "attributes", "error", "_token")
+
+    def __init__(self, name, trace_id, parent_id, sampled, kind, attributes):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes or {})
+        self.error = None
+        self._token = None
+
+    @property
+    def traceparent(self):
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def record_error(self, error):
+        self.error = f"{type(error).__name__}: {error}"
+
+    def end(self):
+        if self.end_ns is not None:
+            return
+        self.end_ns = time.time_ns()
+        if self._token is not None:
+            _current.reset(self._token)
+            self._token = None
+        if self.sampled:
+            _exporter.add(self)
+
+    def to_otlp(self):
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_attribute(key, value) for key, value in self.attributes.items()],
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        if self.error:
+            span["status"] = {"code": 2, "message": self.error}
+        return span
+
+
+def _attribute(key, value):
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def parse_traceparent(header):
+    """Return ``(trace_id, parent_span_id, sampled)`` or ``None`` if invalid."""
+    if not header or not isinstance(header, str):
+        return None
+    match = _TRACEPARENT.match(header.strip())
+    if match is None:
+        return None
+    trace_id, span_id, flags = match.groups()
+    if trace_id == "0" * 32 or span_id == "0" * 16:
+        return None
+    return trace_id, span_id, bool(int(flags, 16) & 1)
+
+
+def enabled():
+    return bool(EXPORT_PATH or EXPORT_URL)
+
+
+def begin(name, traceparent=None, kind=KIND_INTERNAL, attributes=None):
+    """Start a span and make it current; the caller must call ``end()`` on it.
+
+    The parent is ``traceparent`` when given, else the current span, else a
+    new trace is started subject to ``TRACE_SAMPLE_RATIO``.
+    """
+    if not enabled():
+        return NOOP
+    parent = parse_traceparent(traceparent) if traceparent else None
+    if parent is not None:
+        trace_id, parent_id, sampled = parent
+    else:
+        current = _current.get()
+        if current is not None:
+            trace_id, parent_id, sampled = current.trace_id, current.span_id, current.sampled
+        else:
+            trace_id, parent_id, sampled = os.urandom(16).hex(), None, random.random() < SAMPLE_RATIO
+    span = Span(name, trace_id, parent_id, sampled, kind, attributes)
+    span._token = _current.set(span)
+    return span
+
+
+class span:
+    """``with tracing.span("name"):`` -- a child of the current span."""
+
+    def __init__(self, name, traceparent=None, kind=KIND_INTERNAL, attributes=None):
+        self._args = (name, traceparent, kind, attributes)
+        self._span = NOOP
+
+    def __enter__(self):
+        self._span = begin(*self._args)
+        return self._span
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None:
+            self._span.record_error(exc)
+        self._span.end()
+        return False
+
+
+def traced(name, attributes=None):
+    """Decorator wrapping every call of a function in a span."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not enabled():
+                return fn(*args, **kwargs)
+            with span(name, attributes=attributes):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current_traceparent():
+    """``traceparent`` value for propagating the current span downstream."""
+    current = _current.get()
+    return current.traceparent if current is not None else None
+
+
+def sql_comment(query):
+    """Prefix ``query`` with a sqlcommenter-style traceparent when the current span is sampled."""
+    current = _current.get()
+    if current is None or not current.sampled:
+        return query
+    return f"/*traceparent='{current.traceparent}'*/ {query}"
+
+
+class _Exporter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = []
+        self._thread = None
+
+    def add(self, finished):
+        with self._lock:
+            self._pending.append(finished)
+            full = len(self._pending) >= MAX_BATCH
+            if self._thread is None and not full:
+                self._thread = threading.Thread(target=self._loop, daemon=True)
+                self._thread.start()
+        if full:
+            self.flush()
+
+    def _loop(self):
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            batch, self._pending = self._pending, []
+        if not batch:
+            return
+        payload = {
+            "resourceSpans": [{
+                "resource": {"attributes": [
+                    _attribute("service.name", SERVICE_NAME),
+                    _attribute("process.pid", os.getpid()),
+                ]},
+                "scopeSpans": [{"scope": {"name": "tracing.py"}, "spans": [s.to_otlp() for s in batch]}],
+            }]
+        }
+        body = json.dumps(payload, separators=(",", ":"))
+        try:
+            if EXPORT_PATH:
+                with open(EXPORT_PATH, "a", encoding="utf-8") as file:
+                    file.write(body + "\n")
+            if EXPORT_URL:
+                request = urllib.request.Request(EXPORT_URL, data=body.encode("utf-8"),
+                                                 headers={"content-type": "application/json"})
+                urllib.request.urlopen(request, timeout=2).close()
+        except OSError:
+            pass
+
+
+_exporter = _Exporter()
+atexit.register(_exporter.flush)
+
+
+def flush():
+    _exporter.flush()
+
+
+def collect(port=4318, out="traces.jsonl"):
+    """Local stand-in for an OTLP/HTTP collector: append every POSTed batch to ``out``."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("content-length", 0)))
+            with lock, open(out, "ab") as file:
+                file.write(body.rstrip(b"\n") + b"\n")
+            self.send_response(200)
+            self.send_header("content-type", "application/json")
+            self.end_headers()
+            self.wfile.write(b"{}")
+
+        def log_message(self, format, *args):
+            pass
+
+    print(f"collecting OTLP/JSON traces on http://127.0.0.1:{port}/v1/traces into {out}", flush=True)
+    ThreadingHTTPServer(("127.0.0.1", port), Handler).serve_forever()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="command", required=True)
+    collect_parser = sub.add_parser("collect", help="run a local OTLP/JSON collector stand-in")
+    collect_parser.add_argument("--port", type=int, default=4318)
+    collect_parser.add_argument("--out", type=str, default="traces.jsonl")
+    args = parser.parse_args()
+    collect(args.port, args.out)
@@ -1,13 +1,18 @@
+import argparse
+import json
+import time
 import pandas as pd
+import numpy as np
 import nltk
 import string
 from nltk.corpus import stopwords
 from nltk.stem.porter import PorterStemmer
 from nltk.stem import WordNetLemmatizer
 from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.feature_selection import chi2, mutual_info_classif
 from sklearn.naive_bayes import MultinomialNB
 from sklearn.model_selection import train_test_split
-from sklearn.metrics import classification_report, accuracy_score
+from sklearn.metrics import classification_report, accuracy_score, recall_score
 import pickle
 
 
@@ -78,7 +83,126 @@ def transform_text(text: str) -> str:
     return " ".join(out)
 
 
+def strip_vectorizer(vec):
+    """Drop attributes only kept for introspection so the pickle stays small."""
+    if hasattr(vec, 'stop_words_'):
+        del vec.stop_words_
+    return vec
+
+
+def feature_scores(method, X_train, y_train, clf):
+    """Score every column of X_train; higher means more worth keeping."""
+    if method == 'chi2':
+        scores, _ = chi2(X_train, y_train)
+    elif method == 'mutual_info':
+        scores = mutual_info_classif(X_train, y_train, discrete_features=True, random_state=42)
+    elif method == 'nb_weight':
+        scores = np.abs(clf.feature_log_prob_[1] - clf.feature_log_prob_[0])
+    else:
+        raise ValueError(f'unknown feature selection method: {method}')
+    return np.nan_to_num(scores)
+
+
+def artifact_report(vec, clf, texts, y_test, preds):
+    """Accuracy, spam recall, pickle size, load time and transform cost of one vectorizer/model pair."""
+    blob_vec = pickle.dumps(vec)
+    blob_clf = pickle.dumps(clf)
+    load_times = []
+    for _ in range(3):
+        start = time.perf_counter()
+        pickle.loads(blob_vec)
+        pickle.loads(blob_clf)
+        load_times.append(time.perf_counter() - start)
+    transform_times = []
+    for _ in range(3):
+        start = time.perf_counter()
+        for text in texts:
+            vec.transform([text])
+        transform_times.append((time.perf_counter() - start) / len(texts))
+    return {
+        'features': len(vec.vocabulary_),
+        'accuracy': accuracy_score(y_test, preds),
+        'spam_recall': recall_score(y_test, preds, pos_label=1),
+        'vectorizer_bytes': len(blob_vec),
+        'model_bytes': len(blob_clf),
+        'artifact_bytes': len(blob_vec) + len(blob_clf),
+        'load_ms': round(min(load_times) * 1e3, 3),
+        'transform_us_per_message': round(min(transform_times) * 1e6, 2),
+    }
+
+
+def prune(X, y, vec, clf, X_train, y_train, idx_train, idx_test, sizes, method, recall_floor):
+    """Train pruned vectorizer/model pairs at each target size and save them.
+
+    Keeps the top-k features by ``method`` (scored on the training split only),
+    refits the vectorizer on that fixed vocabulary so idf weights are unchanged,
+    retrains MultinomialNB and writes ``vectorizer_pruned<k>.pkl`` /
+    ``pruned<k>.pkl``. Returns the trade-off report for metrics.json.
+    """
+    terms = vec.get_feature_names_out()
+    scores = feature_scores(method, X_train, y_train, clf)
+    order = np.argsort(-scores, kind='stable')
+    texts_test = [X[i] for i in idx_test]
+    y_test = y[idx_test]
+
+    candidates = []
+    baseline = artifact_report(vec, clf, texts_test, y_test, clf.predict(vec.transform(texts_test)))
+    baseline['name'] = 'model'
+    candidates.append(baseline)
+
+    for k in sorted(set(sizes), reverse=True):
+        if k >= len(terms):
+            continue
+        keep = np.sort(order[:k])
+        pruned_vec = TfidfVectorizer(ngram_range=(1,2), vocabulary={terms[i]: n for n, i in enumerate(keep)})
+        pruned_vec.fit(X)
+        # vocabulary_ holds the fitted mapping; the constructor copy only doubles the pickle
+        pruned_vec.vocabulary = None
+        strip_vectorizer(pruned_vec)
+
+        X_pruned = pruned_vec.transform(X)
+        pruned_clf = MultinomialNB()
+        pruned_clf.fit(X_pruned[idx_train], y[idx_train])
+        preds = pruned_clf.predict(X_pruned[idx_test])
+
+        name = f'pruned{k}'
+        with open(f'vectorizer_{name}.pkl', 'wb') as f:
+            pickle.dump(pruned_vec, f)
+        with open(f'{name}.pkl', 'wb') as f:
+            pickle.dump(pruned_clf, f)
+
+        report = artifact_report(pruned_vec, pruned_clf, texts_test, y_test, preds)
+        report['name'] = name
+        candidates.append(report)
+        print(f"{name}: accuracy={report['accuracy']:.4f} spam_recall={report['spam_recall']:.4f} "
+              f"bytes={report['artifact_bytes']} transform_us={report['transform_us_per_message']}")
+
+    if recall_floor is None:
+        recall_floor = baseline['spam_recall']
+    eligible = [c for c in candidates if c['spam_recall'] >= recall_floor]
+    recommended = min(eligible, key=lambda c: c['artifact_bytes'])['name'] if eligible else None
+    return {
+        'method': method,
+        'recall_floor': recall_floor,
+        'recommended': recommended,
+        'candidates': candidates,
+    }
+
+
 def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--select', choices=['chi2', 'mutual_info', 'nb_weight', 'none'], default='chi2',
+                        help='feature selection method for pruned artifacts')
+    parser.add_argument('--sizes', type=str, default='10000,5000,2000,1000',
+                        help='comma separated target vocabulary sizes')
+    parser.add_argument('--recall-floor', type=float, default=None,
+                        help='minimum spam recall for the recommended model (default: full model recall)')
+    parser.add_argument('--prune-only', action='store_true',
+                        help='prune the existing vectorizer.pkl/model.pkl instead of retraining and overwriting them')
+    args = parser.parse_args()
+    if args.prune_only and args.select == 'none':
+        parser.error('--prune-only needs a --select method')
+
     print('Loading dataset...')
     df = pd.read_csv('sms-spam.csv', encoding='latin-1', usecols=[0,1], names=['label','text'], header=0)
     print('Total rows:', len(df))
@@ -93,38 +217,62 @@ def main():
     X = df['clean'].tolist()
     y = df['y'].values
 
-    print('Creating TF-IDF vectorizer with ngram_range=(1,2) and fitting...')
-    vec = TfidfVectorizer(ngram_range=(1,2), max_features=20000)
-    X_vec = vec.fit_transform(X)
+    if args.prune_only:
+        print('Loading vectorizer.pkl and model.pkl...')
+        with open('vectorizer.pkl', 'rb') as f:
+            vec = pickle.load(f)
+        with open('model.pkl', 'rb') as f:
+            clf = pickle.load(f)
+        X_vec = vec.transform(X)
+    else:
+        print('Creating TF-IDF vectorizer with ngram_range=(1,2) and fitting...')
+        vec = TfidfVectorizer(ngram_range=(1,2), max_features=20000)
+        X_vec = vec.fit_transform(X)
+        strip_vectorizer(vec)
 
-    print('Training MultinomialNB...')
-    X_train, X_test, y_train, y_test = train_test_split(X_vec, y, test_size=0.2, random_state=42, stratify=y)
-    clf = MultinomialNB()
-    clf.fit(X_train, y_train)
+    # same split as the shipped model was trained on, so --prune-only scores on held-out rows
+    X_train, X_test, y_train, y_test, idx_train, idx_test = train_test_split(
+        X_vec, y, np.arange(len(X)), test_size=0.2, random_state=42, stratify=y)
+    if not args.prune_only:
+        print('Training MultinomialNB...')
+        clf = MultinomialNB()
+        clf.fit(X_train, y_train)
 
     print('Evaluating on test set...')
     preds = clf.predict(X_test)
     print('Accuracy:', accuracy_score(y_test, preds))
     print(classification_report(y_test, preds))
 
-    # Save vectorizer and model
-    with open('vectorizer.pkl', 'wb') as f:
-        pickle.dump(vec, f)
-    with open('model.pkl', 'wb') as f:
-        pickle.dump(clf, f)
-
-        # Save metrics to a JSON file so the backend/frontend can show performance
-        metrics = {
-            'accuracy': accuracy_score(y_test, preds),
-            'classification_report': classification_report(y_test, preds, output_dict=True)
-        }
-        import json
-        with open('metrics.json', 'w') as fh:
-            json.dump(metrics, fh, indent=2)
-
+    if not args.prune_only:
+        # Save vectorizer and model
+        with open('vectorizer.pkl', 'wb') as f:
+            pickle.dump(vec, f)
+        with open('model.pkl', 'wb') as f:
+            pickle.dump(clf, f)
         print('Saved vectorizer.pkl and model.pkl')
-        print('Saved metrics.json')
 
+    # Save metrics to a JSON file so the backend/frontend can show performance; keep sections
+    # written by other tools (e.g. near_duplicate from neardup.py)
+    try:
+        with open('metrics.json', encoding='utf-8') as fh:
+            metrics = json.load(fh)
+    except (FileNotFoundError, ValueError):
+        metrics = {}
+    if not args.prune_only:
+        metrics['accuracy'] = accuracy_score(y_test, preds)
+        metrics['classification_report'] = classification_report(y_test, preds, output_dict=True)
+
+    if args.select != 'none':
+        print(f'Selecting features with {args.select}...')
+        sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+        metrics['feature_selection'] = prune(
+            X, y, vec, clf, X_train, y_train, idx_train, idx_test, sizes, args.select, args.recall_floor)
+        print('Recommended model:', metrics['feature_selection']['recommended'])
+
+    with open('metrics.json', 'w', encoding='utf-8') as fh:
+        json.dump(metrics, fh, indent=2)
+
+    print('Saved metrics.json')
 
 if __name__ == '__main__':
     main()
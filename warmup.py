@@ -0,0 +1,122 @@
+"""Warm the scoring path before an instance takes traffic.
+
+NLTK loads Punkt on the first ``word_tokenize`` and WordNet on the first
+``lemmatize``, so without this the first prediction after every deploy or
+scale-out pays seconds of corpus loading. ``run`` pushes a few representative
+messages through preprocessing, the vectorizer and the model and returns the
+timings; ``Warmup`` runs it once and backs the readiness endpoints.
+
+``WARMUP_MODE`` picks how ``Warmup.start`` runs: ``background`` (default,
+readiness is 503 until done), ``sync`` (block the caller) or ``off``.
+"""
+import os
+import statistics
+import threading
+import time
+
+import nltk
+
+# package -> path nltk.data.find looks for; NLTK >= 3.8.2 tokenizes with punkt_tab
+NLTK_PACKAGES = {
+    "punkt": "tokenizers/punkt",
+    "punkt_tab": "tokenizers/punkt_tab",
+    "stopwords": "corpora/stopwords",
+    "wordnet": "corpora/wordnet",
+    "omw-1.4": "corpora/omw-1.4",
+}
+
+WARMUP_MESSAGES = (
+    "Hey, are we still meeting for lunch tomorrow?",
+    "Ok lar... Joking wif u oni...",
+    "I'll call you later when I get home, running a bit late",
+    "WINNER!! As a valued network customer you have been selected to receive a £900 prize reward!",
+    "Free entry in 2 a wkly comp to win FA Cup final tkts 21st May 2005. Text FA to 87121",
+    "URGENT! Your mobile number has been awarded a 2000 bonus caller prize. Call 09058094565 now",
+)
+
+
+def ensure_nltk_data():
+    """Download missing NLTK packages once instead of calling ``nltk.download`` per message."""
+    missing = []
+    for package, resource in NLTK_PACKAGES.items():
+        try:
+            nltk.data.find(resource)
+        except LookupError:
+            nltk.download(package, quiet=True)
+            missing.append(package)
+    return missing
+
+
+def _ms(seconds):
+    return round(seconds * 1e3, 3)
+
+
+def run(transform, vectorizer, model, messages=WARMUP_MESSAGES):
+    """Score ``messages`` end to end; ``transform`` maps raw text to the cleaned string."""
+    from nltk.corpus import stopwords
+    from nltk.stem import WordNetLemmatizer
+
+    timings = {}
+    start = time.perf_counter()
+    timings["downloaded"] = ensure_nltk_data()
+    nltk.word_tokenize("warming up the tokenizer")
+    stopwords.words("english")
+    WordNetLemmatizer().lemmatize("warming")
+    timings["corpora_ms"] = _ms(time.perf_counter() - start)
+
+    per_message = []
+    for text in messages:
+        begin = time.perf_counter()
+        vector = vectorizer.transform([transform(text)])
+        model.predict(vector)
+        if hasattr(model, "predict_proba"):
+            model.predict_proba(vector)
+        per_message.append(time.perf_counter() - begin)
+
+    timings["messages"] = len(per_message)
+    if per_message:
+        timings["first_message_ms"] = _ms(per_message[0])
+        timings["steady_message_ms"] = _ms(statistics.median(per_message[1:] or per_message))
+    timings["total_ms"] = _ms(time.perf_counter() - start)
+    return timings
+
+
+class Warmup:
+    """Run a warmup callable once and report readiness."""
+
+    def __init__(self, fn):
+        self._fn = fn
+        self._lock = threading.Lock()
+        self.state = "pending"
+        self.timings = None
+        self.error = None
+
+    @property
+    def ready(self):
+        return self.state in ("ready", "skipped")
+
+    def start(self, mode=None):
+        mode = mode or os.getenv("WARMUP_MODE", "background")
+        with self._lock:
+            if self.state != "pending":
+                return
+            self.state = "skipped" if mode == "off" else "running"
+        if mode == "off":
+            return
+        if mode == "sync":
+            self._run()
+        else:
+            threading.Thread(target=self._run, name="warmup", daemon=True).start()
+
+    def _run(self):
+        try:
+            timings = self._fn()
+        except Exception as error:
+            self.error = f"{type(error).__name__}: {error}"
+            self.state = "failed"
+            return
+        self.timings = timings
+        self.state = "ready"
+
+    def snapshot(self):
+        return {"ready": self.ready, "state": self.state, "timings": self.timings, "error": self.error}